@@ -0,0 +1,98 @@
+'''
+Reading automaton description files:
+• check_file_format(file_name): True if the file has all five section headers
+• parse_automaton(file_name): (states, alphabet, start_state, accept_states, transitions) read from the file
+
+DFA and NFA files use the same format, so dfa.py and nfa.py both read their files with this module.
+'''
+import sys
+
+from profiling import phase
+
+# ==================================== File Format ====================================
+# The file has the "# States" line, followed by the states, then the "# Alphabet" line, followed by the alphabet,
+# then the "# Start" line, followed by the start state, then the "# Accept" line, followed by the accept states,
+# then the "# Transitions" line, followed by the transitions (one "from symbol to" per line).
+# Only these five exact lines are headers ('#' on its own is a symbol). Empty lines are skipped.
+
+STATES, ALPHABET, START, ACCEPT, TRANSITIONS = '# States', '# Alphabet', '# Start', '# Accept', '# Transitions'
+HEADERS = (STATES, ALPHABET, START, ACCEPT, TRANSITIONS)
+
+class AutomatonFormatError(Exception):
+    def __init__(self, file_name, line_number, message):
+        self.file_name = file_name
+        self.line_number = line_number
+        self.message = message
+        if line_number is None:
+            super().__init__(f'{file_name}: {message}')
+        else:
+            super().__init__(f'{file_name}, line {line_number}: {message}')
+
+# ==================================== Checking the file format ====================================
+# Reads the file one line at a time and stops as soon as all the headers have been seen
+def check_file_format(file_name):
+    seen = set()
+    with open(file_name, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if line in HEADERS:
+                seen.add(line)
+                if len(seen) == len(HEADERS):
+                    return True
+    return False
+
+# ==================================== Parsing ====================================
+# A single pass over the file, one line at a time, so only the parsed description is kept in memory and never the
+# raw lines. State and symbol names are interned, so the transition tuples share the strings of the state and
+# symbol lists instead of holding a copy each.
+# Anything that does not fit the format raises an AutomatonFormatError with the line it was found on.
+
+def parse_automaton(file_name):
+    with phase('parse'):
+        return read_sections(file_name)
+
+def read_sections(file_name):
+    states = []
+    alphabet = []
+    start_state = None
+    accept_states = []
+    transitions = []
+    intern = sys.intern
+
+    section = None
+    seen = set()
+    with open(file_name, 'r') as file:
+        for line_number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if line in HEADERS:
+                if line in seen:
+                    raise AutomatonFormatError(file_name, line_number, f'the "{line}" section appears twice')
+                seen.add(line)
+                section = line
+            elif section is None:
+                raise AutomatonFormatError(file_name, line_number, f'"{line}" comes before the first section header')
+            elif section == STATES:
+                states.append(intern(line))
+            elif section == ALPHABET:
+                alphabet.append(intern(line))
+            elif section == START:
+                if start_state is not None:
+                    raise AutomatonFormatError(file_name, line_number, f'a second start state "{line}" (the start state is "{start_state}")')
+                start_state = intern(line)
+            elif section == ACCEPT:
+                accept_states.append(intern(line))
+            else:
+                transition = line.split()
+                if len(transition) != 3:
+                    raise AutomatonFormatError(file_name, line_number, f'"{line}" is not a transition of the form "from symbol to"')
+                transitions.append((intern(transition[0]), intern(transition[1]), intern(transition[2]))) # (from, symbol, to)
+
+    missing = [header for header in HEADERS if header not in seen]
+    if missing:
+        raise AutomatonFormatError(file_name, None, 'missing the ' + ', '.join(f'"{header}"' for header in missing) + ' line' + ('s' if len(missing) > 1 else ''))
+    if start_state is None:
+        raise AutomatonFormatError(file_name, None, 'no start state after the "# Start" line')
+
+    return states, alphabet, start_state, accept_states, transitions
@@ -0,0 +1,189 @@
+'''
+Binary automaton files:
+• save_dfa(file_name, dfa) / load_dfa(file_name): a CompiledDFA
+• save_nfa(file_name, nfa) / load_nfa(file_name): an NFA
+
+The text format has to be split and interned line by line. The binary format stores the automaton the way it is
+kept in memory, so loading it is a few slices. load_dfa memory-maps the file and runs the DFA directly on the
+mapped transition table, so several processes that load the same file share one copy of the table (the pages of
+the file in the OS page cache) instead of each parsing the text and keeping its own table.
+'''
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from dfa import CompiledDFA
+from nfa import NFA
+
+# ==================================== File Layout ====================================
+# Everything is little endian.
+# header:   magic "AUTM", version (u16), kind (u16, 0 = DFA, 1 = NFA), |Q| (u32), number of symbols (u32), size of the
+#           alphabet (u32), start state (i32, -1 if none), then (offset, length) in bytes (u64, u64) of each of the four
+#           sections below
+# sections: table   DFA: |Q| x |Σ| i32, row-major, -1 for a missing transition
+#                   NFA: (from, symbol, to) i32 triples, one per transition
+#           accept  bitset of the accept states, bit q of byte q // 8
+#           states  names of the states:  |Q| + 1 offsets (u32) into the utf-8 bytes that follow them
+#           symbols names of the symbols: |Σ| + 1 offsets (u32) into the utf-8 bytes that follow them
+#                   (for an NFA, symbols that only appear in transitions, like eps, are added after the alphabet,
+#                   so the alphabet is the first "size of the alphabet" symbols)
+# Every section starts at a multiple of 8, so the table can be used in place as an array of i32.
+
+MAGIC = b'AUTM'
+VERSION = 2
+DFA_KIND, NFA_KIND = 0, 1
+HEADER = struct.Struct('<4sHHIIIi' + 'QQ' * 4)
+
+def align(size):
+    return (size + 7) & ~7
+
+def pack_names(names):
+    names = [name.encode('utf-8') for name in names]
+    offsets = [0]
+    for name in names:
+        offsets.append(offsets[-1] + len(name))
+    return struct.pack(f'<{len(offsets)}I', *offsets) + b''.join(names)
+
+def unpack_names(data, count):
+    offsets = struct.unpack_from(f'<{count + 1}I', data, 0)
+    blob = bytes(data[4 * (count + 1):])
+    return [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(count)]
+
+def pack_bits(indices, count):
+    bits = bytearray((count + 7) // 8)
+    for i in indices:
+        bits[i // 8] |= 1 << (i % 8)
+    return bytes(bits)
+
+# the other way around: accepting[i] is 1 if bit i is set
+def unpack_bits(bits, count):
+    accepting = bytearray(count)
+    for i in range(min(len(bits), (count + 7) // 8)):
+        byte = bits[i]
+        if byte:
+            for bit in range(8):
+                if byte >> bit & 1 and i * 8 + bit < count:
+                    accepting[i * 8 + bit] = 1
+    return accepting
+
+def pack_ints(values):
+    return struct.pack(f'<{len(values)}i', *values)
+
+# ==================================== Writing ====================================
+# The file is written next to the old one and then renamed over it, so a process that has the old file mapped keeps
+# its copy (truncating a mapped file would kill it with SIGBUS) and a reader never sees a half written file.
+def write(file_name, kind, num_states, num_symbols, alphabet_size, start, sections):
+    offsets = []
+    position = align(HEADER.size)
+    for section in sections:
+        offsets += [position, len(section)]
+        position = align(position + len(section))
+
+    temp_name = f'{file_name}.{os.getpid()}.tmp'
+    try:
+        with open(temp_name, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION, kind, num_states, num_symbols, alphabet_size, start, *offsets))
+            for (offset, _), section in zip(zip(offsets[::2], offsets[1::2]), sections):
+                file.write(b'\0' * (offset - file.tell()))
+                file.write(section)
+        os.replace(temp_name, file_name)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
+
+def save_dfa(file_name, dfa):
+    n = len(dfa.states)
+    accept = [q for q in range(n) if dfa.accepting[q]]
+    sections = [pack_ints(dfa.table), pack_bits(accept, n), pack_names(dfa.states), pack_names(dfa.alphabet)]
+    write(file_name, DFA_KIND, n, dfa.num_symbols, dfa.num_symbols, dfa.start, sections)
+
+def save_nfa(file_name, nfa):
+    state_index = {state: i for i, state in enumerate(nfa.states)}
+    symbol_index = {symbol: i for i, symbol in enumerate(nfa.alphabet)}
+    alphabet_size = len(symbol_index)
+    triples = []
+    for (from_state, symbol, to_state) in nfa.transitions:
+        if symbol not in symbol_index:    # eps is usually not listed in the alphabet
+            symbol_index[symbol] = len(symbol_index)
+        triples += [state_index[from_state], symbol_index[symbol], state_index[to_state]]
+    symbols = sorted(symbol_index, key=symbol_index.get)
+    accept = [state_index[state] for state in nfa.accept_states if state in state_index]
+    sections = [pack_ints(triples), pack_bits(accept, len(nfa.states)), pack_names(nfa.states), pack_names(symbols)]
+    write(file_name, NFA_KIND, len(nfa.states), len(symbols), alphabet_size, state_index.get(nfa.start_state, -1), sections)
+
+# ==================================== Reading ====================================
+def read_header(data, file_name, kind):
+    if len(data) < HEADER.size:
+        raise Exception(f'{file_name} is not a binary automaton file.')
+    magic, version, file_kind, num_states, num_symbols, alphabet_size, start, *offsets = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise Exception(f'{file_name} is not a binary automaton file.')
+    if version != VERSION:
+        raise Exception(f'{file_name} has version {version} of the binary format, only version {VERSION} can be read.')
+    if file_kind != kind:
+        raise Exception(f'{file_name} does not hold a{"n NFA" if kind == NFA_KIND else " DFA"}.')
+    if not -1 <= start < num_states or alphabet_size > num_symbols:
+        raise Exception(f'{file_name} has a corrupt header.')
+    sections = []
+    for offset, length in zip(offsets[::2], offsets[1::2]):
+        if offset + length > len(data):
+            raise Exception(f'{file_name} is truncated.')
+        sections.append(memoryview(data)[offset:offset + length])
+    return num_states, num_symbols, alphabet_size, start, sections
+
+def map_file(file_name):
+    with open(file_name, 'rb') as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+# ==================================== Mapped DFA ====================================
+# A CompiledDFA whose table is the mapped table section of the file (a memoryview of i32, so it is never copied).
+# As in CompiledDFA, the list of transitions is only built if someone asks for it (is_dfa, write_dfa_description, ...).
+
+class MappedDFA(CompiledDFA):
+    def __init__(self, states, alphabet, start, accept_bits, table, mapping):
+        self.states = states
+        self.alphabet = alphabet
+        self.state_index = {state: i for i, state in enumerate(states)}
+        self.symbol_index = {symbol: i for i, symbol in enumerate(alphabet)}
+        self.num_symbols = len(alphabet)
+        self.start = start
+        self.start_state = states[start] if start >= 0 else ''
+        self.accepting = unpack_bits(accept_bits, len(states))
+        self.accept_states = [state for i, state in enumerate(states) if self.accepting[i]]
+        self.table = table
+        self.unstored = []
+        self.mapping = mapping    # keeps the file mapped as long as the DFA is alive
+
+    def __reduce__(self):
+        # pickling a mapped DFA (e.g. to send it to a worker process) sends a plain CompiledDFA
+        return (CompiledDFA, tuple(self))
+
+def load_dfa(file_name):
+    mapping = map_file(file_name)
+    num_states, num_symbols, _, start, (table, accept, states, symbols) = read_header(mapping, file_name, DFA_KIND)
+    if len(table) != 4 * num_states * num_symbols:
+        raise Exception(f'{file_name} has a transition table of the wrong size.')
+    if sys.byteorder == 'little':
+        table = table.cast('i')
+    else:
+        table = array('i', struct.unpack(f'<{num_states * num_symbols}i', table))
+    if len(table) and (min(table) < -1 or max(table) >= num_states):
+        raise Exception(f'{file_name} has a transition that is out of range.')
+    return MappedDFA(unpack_names(states, num_states), unpack_names(symbols, num_symbols), start, bytes(accept), table, mapping)
+
+# The NFA is built from the mapped file; nothing of the file is kept after that, the NFA keeps its own rows
+def load_nfa(file_name):
+    mapping = map_file(file_name)
+    num_states, num_symbols, alphabet_size, start, (table, accept, states, symbols) = read_header(mapping, file_name, NFA_KIND)
+    states = unpack_names(states, num_states)
+    symbols = unpack_names(symbols, num_symbols)
+    accepting = unpack_bits(accept, num_states)
+    triples = struct.unpack(f'<{len(table) // 4}i', table)
+    if triples and (min(triples) < 0 or max(max(triples[0::3]), max(triples[2::3])) >= num_states or max(triples[1::3]) >= num_symbols):
+        raise Exception(f'{file_name} has a transition that is out of range.')
+    transitions = [(states[triples[i]], symbols[triples[i + 1]], states[triples[i + 2]]) for i in range(0, len(triples), 3)]
+    accept_states = [state for i, state in enumerate(states) if accepting[i]]
+    return NFA(states, symbols[:alphabet_size], states[start] if start >= 0 else '', accept_states, transitions)
@@ -0,0 +1,114 @@
+'''
+Automaton cache:
+• load_dfa(file_name): the CompiledDFA described in the file, or None if the file is not a valid DFA
+• load_nfa(file_name): the NFA described in the file, or None if the file is not a valid NFA
+
+A file is parsed and validated only the first time it is loaded; after that the same object is returned
+until the file changes.
+'''
+import hashlib
+import os
+import pickle
+
+import profiling
+
+from automaton_format import AutomatonFormatError
+from dfa import read_dfa_description, is_dfa
+from nfa import read_nfa_description, NFA
+
+# ==================================== Cache ====================================
+# Every entry remembers the mtime and size of the file and the sha256 of its contents.
+# On a load we only stat the file: if the mtime and the size are the same, the entry is used as it is.
+# If they changed we hash the file, and only parse it again when the hash changed too (so touching a file is cheap).
+# Invalid files are cached as None, so they are not validated again on every load either.
+#
+# With sidecar=True the parsed automaton is also pickled next to the file (dfa.txt -> dfa.txt.pickle) together
+# with the hash of the text, so a new process can skip the parsing and the validation when the text did not change.
+# SIDECAR_VERSION changes whenever the pickled objects change shape, so an old sidecar is parsed again, not unpickled.
+
+SIDECAR_SUFFIX = '.pickle'
+SIDECAR_VERSION = 2
+
+cache = {}
+
+def file_hash(file_name):
+    with open(file_name, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def parse_dfa(file_name):
+    try:
+        dfa = read_dfa_description(file_name)
+    except AutomatonFormatError:
+        return None
+    if is_dfa(*dfa) == False:
+        return None
+    return dfa
+
+def parse_nfa(file_name):
+    try:
+        return NFA(*read_nfa_description(file_name))
+    except Exception:    # a format error, or an NFA that does not pass its own validation
+        return None
+
+def read_sidecar(file_name, kind, digest):
+    try:
+        with open(file_name + SIDECAR_SUFFIX, 'rb') as file:
+            saved = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return False, None
+    if not isinstance(saved, dict) or saved.get('version') != SIDECAR_VERSION or saved.get('kind') != kind or saved.get('hash') != digest:
+        return False, None
+    return True, saved['automaton']
+
+def write_sidecar(file_name, kind, digest, automaton):
+    try:
+        with open(file_name + SIDECAR_SUFFIX, 'wb') as file:
+            pickle.dump({'version': SIDECAR_VERSION, 'kind': kind, 'hash': digest, 'automaton': automaton}, file)
+    except OSError:
+        pass    # the sidecar is only an optimization
+
+# an entry loaded without a sidecar gets one the first time it is loaded with sidecar=True
+def cached(path, kind, entry, sidecar):
+    if profiling.active is not None:
+        profiling.active.count('cache hits')
+    if sidecar and not entry['saved']:
+        write_sidecar(path, kind, entry['hash'], entry['automaton'])
+        entry['saved'] = True
+    return entry['automaton']
+
+def load(file_name, kind, parse, sidecar):
+    path = os.path.abspath(file_name)
+    info = os.stat(path)
+    key = (kind, path)
+    entry = cache.get(key)
+    if entry is not None and entry['mtime'] == info.st_mtime_ns and entry['size'] == info.st_size:
+        return cached(path, kind, entry, sidecar)
+
+    digest = file_hash(path)
+    if entry is not None and entry['hash'] == digest:
+        entry['mtime'], entry['size'] = info.st_mtime_ns, info.st_size
+        return cached(path, kind, entry, sidecar)
+
+    if profiling.active is not None:
+        profiling.active.count('cache misses')
+    found = False
+    if sidecar:
+        found, automaton = read_sidecar(path, kind, digest)
+        if found and profiling.active is not None:
+            profiling.active.count('sidecar hits')
+    if not found:
+        automaton = parse(path)
+        if sidecar:
+            write_sidecar(path, kind, digest, automaton)
+
+    cache[key] = {'mtime': info.st_mtime_ns, 'size': info.st_size, 'hash': digest, 'automaton': automaton, 'saved': sidecar}
+    return automaton
+
+def load_dfa(file_name, sidecar=False):
+    return load(file_name, 'dfa', parse_dfa, sidecar)
+
+def load_nfa(file_name, sidecar=False):
+    return load(file_name, 'nfa', parse_nfa, sidecar)
+
+def clear_cache():
+    cache.clear()
@@ -0,0 +1,151 @@
+'''
+NFA to DFA conversion and DFA minimization:
+• determinize(nfa): subset construction, turns an NFA N into a DFA M with L(M) = L(N)
+• minimize(dfa): Hopcroft's algorithm, merges the equivalent states of a DFA
+
+Both return a CompiledDFA, so the result can be run with simulate_dfa or saved with write_dfa_description.
+'''
+import sys
+
+from automaton_format import AutomatonFormatError
+from dfa import CompiledDFA, read_dfa_description, write_dfa_description, dfa_problems
+from nfa import NFA, read_nfa_description
+from operations import NFARunner, explore, inverse_table
+
+# ==================================== Subset Construction ====================================
+# Every DFA state is a set of NFA states (their ids, closed under eps arrows). We start from the eps-closure of the
+# start state and keep exploring the sets we can reach on each symbol. The empty set becomes the dead state, so the DFA
+# is complete.
+# The DFA states are named q0, q1, ... in the order they are discovered (q0 is the start state).
+# The search itself is explore in operations.py, which also builds the products.
+
+def determinize(nfa):
+    r = NFARunner(nfa)
+    return explore(r.alphabet, r.start, r.step, r.accepting)
+
+# ==================================== Hopcroft Minimization ====================================
+# 1. Drop the states that cannot be reached from the start state (a missing transition goes to an extra dead state)
+# 2. Start with the partition {accepting, non accepting} and keep splitting blocks: a block B is split by (A, symbol)
+#    into the states that move into A on symbol and the ones that don't. Only the smaller half of a split needs
+#    to be used as a splitter later, which gives the O(|Σ| n log n) bound.
+# 3. Every block of the final partition becomes one state of the minimal DFA.
+
+def minimize(dfa):
+    n, k = len(dfa.states), dfa.num_symbols
+    dead = n    # index of the (possibly unused) dead state
+
+    def next_state(state, symbol):
+        if state == dead:
+            return dead
+        to_state = dfa.table[state * k + symbol]
+        return dead if to_state < 0 else to_state
+
+    # 1. reachable states, in bfs order
+    if dfa.start < 0:
+        raise Exception('The start state is not one of the states of the DFA.')
+    reachable = [dfa.start]
+    seen = {dfa.start}
+    i = 0
+    while i < len(reachable):
+        state = reachable[i]
+        i += 1
+        for symbol in range(k):
+            to_state = next_state(state, symbol)
+            if to_state not in seen:
+                seen.add(to_state)
+                reachable.append(to_state)
+
+    # inverse[symbol][q] = states that move to q on symbol
+    inverse = inverse_table(reachable, k, next_state)
+
+    # 2. partition refinement
+    accepting = {state for state in reachable if state != dead and dfa.is_accepting(state)}
+    rejecting = seen - accepting
+    blocks = [set(block) for block in (accepting, rejecting) if block]
+    block_of = {}
+    for b, block in enumerate(blocks):
+        for state in block:
+            block_of[state] = b
+    worklist = [min(range(len(blocks)), key=lambda b: len(blocks[b]))] if len(blocks) == 2 else []
+    in_worklist = set(worklist)
+
+    while worklist:
+        splitter = worklist.pop()
+        in_worklist.discard(splitter)
+        splitter = list(blocks[splitter])
+        for symbol in range(k):
+            touched = {}
+            for state in splitter:
+                for from_state in inverse[symbol].get(state, ()):
+                    touched.setdefault(block_of[from_state], set()).add(from_state)
+            for b, inside in touched.items():
+                if len(inside) == len(blocks[b]):
+                    continue
+                blocks[b] -= inside
+                new_b = len(blocks)
+                blocks.append(inside)
+                for state in inside:
+                    block_of[state] = new_b
+                if b in in_worklist:
+                    worklist.append(new_b)
+                    in_worklist.add(new_b)
+                else:
+                    smaller = b if len(blocks[b]) <= len(inside) else new_b
+                    worklist.append(smaller)
+                    in_worklist.add(smaller)
+
+    # 3. one state per block, named in bfs order from the start block
+    names = {}
+    for state in reachable:
+        if block_of[state] not in names:
+            names[block_of[state]] = f'q{len(names)}'
+
+    states = list(names.values())
+    accept_states = [names[b] for b in names if next(iter(blocks[b])) in accepting]
+    transitions = []
+    for b in names:
+        representative = next(iter(blocks[b]))
+        for symbol in range(k):
+            transitions.append((names[b], dfa.alphabet[symbol], names[block_of[next_state(representative, symbol)]]))
+
+    return CompiledDFA(states, list(dfa.alphabet), names[block_of[dfa.start]], accept_states, transitions)
+
+# ==================================== Main Function ====================================
+# python convert.py nfa.txt dfa_out.txt      - determinizes and minimizes an NFA
+# python convert.py --dfa dfa.txt dfa_out.txt - minimizes a DFA
+def main():
+    args = sys.argv[1:]
+    from_dfa = '--dfa' in args
+    args = [arg for arg in args if arg != '--dfa']
+    if len(args) != 2:
+        print('Usage: python convert.py [--dfa] <input file> <output file>')
+        return
+
+    in_file, out_file = args
+    try:
+        if from_dfa:
+            dfa = read_dfa_description(in_file)
+        else:
+            nfa = NFA(*read_nfa_description(in_file))
+    except AutomatonFormatError as error:
+        print('The file is not in the correct format. Please check the file format and try again.')
+        print(error)
+        return
+
+    if from_dfa:
+        problems = dfa_problems(*dfa)
+        if problems:
+            print('The DFA is not valid:')
+            for problem in problems:
+                print(' -', problem)
+            return
+    else:
+        dfa = determinize(nfa)
+
+    minimal = minimize(dfa)
+    write_dfa_description(out_file, minimal)
+    print(f'Wrote a DFA with {len(minimal.states)} states to {out_file} (the input DFA had {len(dfa.states)} states)')
+
+# ==================================== Run ====================================
+if __name__ == '__main__':
+    main()
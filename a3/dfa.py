@@ -9,131 +9,241 @@ To simulate a DFA
 3. If we reach the end of the string and we are in an accepting state, then the string is in the language
 4. If we reach the end of the string and we are not in an accepting state, then the string is not in the language
 '''
+from array import array
+
+from automaton_format import check_file_format, parse_automaton, AutomatonFormatError
+import profiling
+from profiling import phase
 
-# ==================================== Checking the file format ====================================
-#check if the file is in the correct format
-def check_file_format(file_name):
-    with open(file_name, 'r') as file:
-        lines = file.readlines()
-        if len(lines) < 5:
-            return False
-        #we need to check if there are lines starting with # States, # Alphabet, # Start, # Accept, # Transitions
-        states, alphabet, start, accept, transitions = False, False, False, False, False
-        for line in lines:
-            line = line.strip()
-            if line == '# States':
-                states = True
-            elif line == '# Alphabet':
-                alphabet = True
-            elif line == '# Start':
-                start = True
-            elif line == '# Accept':
-                accept = True
-            elif line == '# Transitions':
-                transitions = True
-        return states and alphabet and start and accept and transitions
-    
 #==================================== Reading the DFA ====================================
-# The file has the "# States" line, followed by the states, then the "# Alphabet" line, followed by the alphabet, then the "# Start" line, 
-# followed by the start state, then the "# Accept" line, followed by the accept states, then the "# Transitions" line, followed by the transitions
-
-def read_dfa_description(file_name):    
-    states = []
-    alphabet = []
-    start_state = ''
-    accept_states = []
-    transitions = []
-    with open(file_name, 'r') as file:
-        lines = file.readlines()
-        reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, False, False, False, False
-        for line in lines:
-            line = line.strip()
-            if line == '# States':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = True, False, False, False, False
-            elif line == '# Alphabet':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, True, False, False, False
-            elif line == '# Start':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, False, True, False, False
-            elif line == '# Accept':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, False, False, True, False
-            elif line == '# Transitions':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, False, False, False, True
-
-            elif reading_states:
-                states.append(line)
-            elif reading_alphabet:
-                alphabet.append(line)
-            elif reading_start:
-                start_state = line
-            elif reading_accept:
-                accept_states.append(line)
-            elif reading_transitions:
-                transition = line.split()
-                transitions.append((transition[0], transition[1], transition[2])) # (from, symbol, to)
-
-    return states, alphabet, start_state, accept_states, transitions
+# check_file_format and the parser are shared with nfa.py, see automaton_format.py for the file format
+
+def read_dfa_description(file_name):
+    description = parse_automaton(file_name)
+    with phase('compile'):
+        return CompiledDFA(*description)
+
+#==================================== Compiling the DFA ====================================
+# Instead of scanning the list of transitions for every input symbol, we intern the states and the symbols to integers
+# and store the transition function as a dense row-major table: the next state of (state, symbol) is at table[state * |Σ| + symbol].
+# The accept states are kept as a bytearray (accepting[i] is 1 if state i accepts), so both a step and the final
+# check cost O(1).
+# A missing transition is stored as -1 (the dfa rejects if it ever has to follow it).
+# The list of transitions is not kept next to the table: the transitions property rebuilds it from the table, plus the
+# few transitions the table cannot hold (one with an unknown state or symbol, or a second one for the same pair), so
+# validating the DFA still sees every transition it was given. Only __iter__, is_dfa and writing the DFA pay for it.
+# Unpacking the object gives back the plain description, so is_dfa(*dfa) still works.
+
+class CompiledDFA:
+    def __init__(self, states, alphabet, start_state, accept_states, transitions):
+        self.states = states
+        self.alphabet = alphabet
+        self.start_state = start_state
+        self.accept_states = accept_states
+
+        self.state_index = {state: i for i, state in enumerate(states)}
+        self.symbol_index = {symbol: i for i, symbol in enumerate(alphabet)}
+        self.num_symbols = len(alphabet)
+        self.start = self.state_index.get(start_state, -1)
+
+        self.accepting = bytearray(len(states))    # accepting[i] is 1 if state i accepts
+        for state in accept_states:
+            if state in self.state_index:
+                self.accepting[self.state_index[state]] = 1
+
+        self.table = array('i', [-1]) * (len(states) * self.num_symbols)
+        self.unstored = []    # the transitions that are not in the table
+        for (from_state, symbol, to_state) in transitions:
+            if from_state in self.state_index and symbol in self.symbol_index and to_state in self.state_index:
+                i = self.state_index[from_state] * self.num_symbols + self.symbol_index[symbol]
+                if self.table[i] >= 0:    # the last transition for a pair is the one in the table
+                    self.unstored.append((from_state, symbol, states[self.table[i]]))
+                self.table[i] = self.state_index[to_state]
+            else:
+                self.unstored.append((from_state, symbol, to_state))
+
+    @property
+    def transitions(self):
+        k = self.num_symbols
+        return [(self.states[i // k], self.alphabet[i % k], self.states[to_state])
+                for i, to_state in enumerate(self.table) if to_state >= 0] + self.unstored
+
+    def __iter__(self):
+        return iter((self.states, self.alphabet, self.start_state, self.accept_states, self.transitions))
+
+    def step(self, state, symbol):
+        symbol = self.symbol_index.get(symbol)
+        if symbol is None or state < 0:
+            return -1
+        return self.table[state * self.num_symbols + symbol]
+
+    def is_accepting(self, state):
+        return state >= 0 and self.accepting[state] == 1
+
+    def accepts(self, string):
+        if profiling.active is not None:
+            return self.accepts_profiled(string, profiling.active)
+        table, symbol_index, n = self.table, self.symbol_index, self.num_symbols
+        current_state = self.start
+        if current_state < 0:
+            return False
+        for symbol in string:
+            symbol = symbol_index.get(symbol)
+            if symbol is None:
+                return False
+            current_state = table[current_state * n + symbol]
+            if current_state < 0:
+                return False
+        return self.accepting[current_state] == 1
+
+    # accepts, counting the transitions taken, for profiling.profile()
+    def accepts_profiled(self, string, stats):
+        table, symbol_index, n = self.table, self.symbol_index, self.num_symbols
+        with phase('simulate'):
+            stats.count('strings')
+            current_state = self.start
+            taken = 0
+            for symbol in string:
+                if current_state < 0:
+                    break
+                symbol = symbol_index.get(symbol)
+                current_state = -1 if symbol is None else table[current_state * n + symbol]
+                taken += 1
+            stats.count('transitions', taken)
+            accepted = self.is_accepting(current_state)
+            stats.count('accepted' if accepted else 'rejected')
+            return accepted
+
+
+#==================================== Writing the DFA ====================================
+# Writes the DFA back in the same format read_dfa_description reads, so a DFA we build in code can be saved and loaded again
+def write_dfa_description(file_name, dfa):
+    states, alphabet, start_state, accept_states, transitions = dfa
+    with open(file_name, 'w') as file:
+        file.write('# States\n')
+        for state in states:
+            file.write(state + '\n')
+        file.write('# Alphabet\n')
+        for symbol in alphabet:
+            file.write(symbol + '\n')
+        file.write('# Start\n')
+        file.write(start_state + '\n')
+        file.write('# Accept\n')
+        for state in accept_states:
+            file.write(state + '\n')
+        file.write('# Transitions\n')
+        for (from_state, symbol, to_state) in transitions:
+            file.write(f'{from_state} {symbol} {to_state}\n')
 
 # ==================================== Validity of the DFA ====================================
+# a dfa is a valid dfa if:
+# 1. the start state is in the set of states
+# 2. the accept states are a subset of the states
+# 3. for each state and symbol, there is exactly one transition (and it goes to a state)
+# 4. the alphabet is not empty
+# dfa_problems checks all of this in one sweep over the transitions, with a hashed index of the (state, symbol)
+# pairs seen so far, and returns every problem it finds (an empty list means the dfa is valid).
+# The |Q| x |Σ| sweep for missing transitions is only needed if there are fewer distinct pairs than |Q| x |Σ|.
+# find_problems keeps the missing (state, symbol) pairs apart from the other problems, since complete_dfa can fix them.
+
 def is_dfa(states, alphabet, start_state, accept_states, transitions):
-    # a dfa is a valid dfa if:
-    # 1. the start state is in the set of states
-    # 2. the accept states are a subset of the states
-    # 3. for each state and symbol, there is exactly one transition
-    # 4. the alphabet is not empty
-    if start_state not in states:
-        return False
-    if not set(accept_states).issubset(set(states)):
-        return False
+    with phase('validate'):
+        return not dfa_problems(states, alphabet, start_state, accept_states, transitions)
+
+def dfa_problems(states, alphabet, start_state, accept_states, transitions):
+    problems, missing = find_problems(states, alphabet, start_state, accept_states, transitions)
+    return problems + [f'there is no transition from "{state}" on "{symbol}"' for (state, symbol) in missing]
+
+def find_problems(states, alphabet, start_state, accept_states, transitions):
+    problems = []
+    state_set, symbol_set = set(states), set(alphabet)
+    if start_state not in state_set:
+        problems.append(f'the start state "{start_state}" is not one of the states')
+    for state in accept_states:
+        if state not in state_set:
+            problems.append(f'the accept state "{state}" is not one of the states')
     if len(alphabet) == 0:
-        return False
-    for state in states:
-        for symbol in alphabet:
-            transitions_from_state = [t for t in transitions if t[0] == state and t[1] == symbol]
-            if len(transitions_from_state) != 1:
-                return False
-    return True
+        problems.append('the alphabet is empty')
+
+    seen = set()
+    duplicates = {}
+    for (from_state, symbol, to_state) in transitions:
+        if from_state not in state_set:
+            problems.append(f'the transition {from_state} {symbol} {to_state} starts from "{from_state}", which is not a state')
+            continue
+        if symbol not in symbol_set:
+            problems.append(f'the transition {from_state} {symbol} {to_state} reads "{symbol}", which is not in the alphabet')
+            continue
+        if to_state not in state_set:
+            problems.append(f'the transition {from_state} {symbol} {to_state} goes to "{to_state}", which is not a state')
+        if (from_state, symbol) in seen:
+            duplicates[(from_state, symbol)] = duplicates.get((from_state, symbol), 1) + 1
+        seen.add((from_state, symbol))
+
+    for (state, symbol), count in duplicates.items():
+        problems.append(f'there are {count} transitions from "{state}" on "{symbol}"')
+    missing = []
+    if len(seen) < len(state_set) * len(symbol_set):
+        missing = [(state, symbol) for state in states for symbol in alphabet if (state, symbol) not in seen]
+    return problems, missing
+
+# ==================================== Completing the DFA ====================================
+# A partial DFA (some transitions missing) can still be simulated after adding a dead state: every missing
+# transition goes to it, and it goes to itself on every symbol. The dead state is only added if something is missing.
+# Problems that a dead state cannot fix (duplicate transitions, unknown states, ...) raise an exception.
+
+def complete_dfa(dfa, dead_state='dead'):
+    states, alphabet, start_state, accept_states, transitions = dfa
+    problems, missing = find_problems(states, alphabet, start_state, accept_states, transitions)
+    if problems:
+        raise Exception('The DFA cannot be completed: ' + '; '.join(problems))
+
+    if not missing:
+        return dfa if isinstance(dfa, CompiledDFA) else CompiledDFA(states, alphabet, start_state, accept_states, transitions)
+
+    while dead_state in states:
+        dead_state += "'"
+    transitions = list(transitions) + [(state, symbol, dead_state) for (state, symbol) in missing]
+    transitions += [(dead_state, symbol, dead_state) for symbol in alphabet]
+    return CompiledDFA(list(states) + [dead_state], alphabet, start_state, accept_states, transitions)
 
 # ==================================== Simulating the DFA ====================================
-def simulate_dfa(states, alphabet, start_state, accept_states, transitions, string):
-    current_state = start_state
-    for symbol in string:
-        if symbol not in alphabet:
-            print(f'The string "{string}" is not in the language')
-            return
-        transition = [t for t in transitions if t[0] == current_state and t[1] == symbol][0]
-        current_state = transition[2]
-    
-    res = current_state in accept_states
-    if res:
-        print(f'The string "{string}" is in the language')
-    else:
-        print(f'The string "{string}" is not in the language')
+def simulate_dfa(dfa, string):
+    return dfa.accepts(string)
 
 # ==================================== Main Function ====================================
 def main():
     print('Welcome to the DFA simulator')
     file_name = 'dfa.txt'
 
-    if not check_file_format(file_name):
+    try:
+        dfa = read_dfa_description(file_name)
+    except AutomatonFormatError as error:
         print('The file is not in the correct format. Please check the file format and try again.')
+        print(error)
         print('The file should have the "# States" line, followed by the states, then the "# Alphabet" line, followed by the alphabet, then the "# Start" line, followed by the start state, then the "# Accept" line, followed by the accept states, then the "# Transitions" line, followed by the transitions')
         return
-    
-    states, alphabet, start_state, accept_states, transitions = read_dfa_description(file_name)
 
-    if is_dfa(states, alphabet, start_state, accept_states, transitions) == False:
-        print('The DFA is not valid')
+    problems = dfa_problems(*dfa)
+    if problems:
+        print('The DFA is not valid:')
+        for problem in problems:
+            print(' -', problem)
         return
     
     choice = input('Do you want to check if a string is in the language? (y/n) ')
 
     while choice == 'y':
         string = input('Enter a string to check if it is in the language: ')
-        simulate_dfa(states, alphabet, start_state, accept_states, transitions, string)
+        if simulate_dfa(dfa, string):
+            print(f'The string "{string}" is in the language')
+        else:
+            print(f'The string "{string}" is not in the language')
         choice = input('Do you want to check if another string is in the language? (y/n) ')
 
     print('Thank you for using the DFA simulator')
     print('Bye bye!')        
 
 # ==================================== Run ====================================
-main()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
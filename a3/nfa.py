@@ -3,125 +3,314 @@ NFA Simulation:
 • Input: A description of a NFA N over an arbitrary alphabet Σ; and a string x ∈ Σ∗
 • Output: Accept if x ∈ L(N), otherwise reject
 '''
-# ==================================== Checking the file format ====================================
-#check if the file is in the correct format
-def check_file_format(file_name):
-    with open(file_name, 'r') as file:
-        lines = file.readlines()
-        if len(lines) < 5:
-            return False
-        #we need to check if there are lines starting with # States, # Alphabet, # Start, # Accept, # Transitions
-        states, alphabet, start, accept, transitions = False, False, False, False, False
-        for line in lines:
-            line = line.strip()
-            if line == '# States':
-                states = True
-            elif line == '# Alphabet':
-                alphabet = True
-            elif line == '# Start':
-                start = True
-            elif line == '# Accept':
-                accept = True
-            elif line == '# Transitions':
-                transitions = True
-        return states and alphabet and start and accept and transitions
-    
+from array import array
+
+from automaton_format import check_file_format, parse_automaton, AutomatonFormatError
+import profiling
+from profiling import phase
+
 #==================================== Reading the NFA ====================================
-# The file has the "# States" line, followed by the states, then the "# Alphabet" line, followed by the alphabet, then the "# Start" line, followed by the start state, then the "# Accept" line, followed by the accept states, then the "# Transitions" line, followed by the transitions
-
-def read_nfa_description(file_name):    
-    states = []
-    alphabet = []
-    start_state = ''
-    accept_states = []
-    transitions = []
-    with open(file_name, 'r') as file:
-        lines = file.readlines()
-        reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, False, False, False, False
-        for line in lines:
-            line = line.strip()
-            if line == '# States':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = True, False, False, False, False
-            elif line == '# Alphabet':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, True, False, False, False
-            elif line == '# Start':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, False, True, False, False
-            elif line == '# Accept':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, False, False, True, False
-            elif line == '# Transitions':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, False, False, False, True
-
-            elif reading_states:
-                states.append(line)
-            elif reading_alphabet:
-                alphabet.append(line)
-            elif reading_start:
-                start_state = line
-            elif reading_accept:
-                accept_states.append(line)
-            elif reading_transitions:
-                transition = line.split()
-                transitions.append((transition[0], transition[1], transition[2])) # (from, symbol, to)
-
-    return states, alphabet, start_state, accept_states, transitions
+# check_file_format and the parser are shared with dfa.py, see automaton_format.py for the file format
+
+def read_nfa_description(file_name):
+    return parse_automaton(file_name)
+
+#==================================== Writing the NFA ====================================
+# Writes the NFA back in the same format read_nfa_description reads
+def write_nfa_description(file_name, nfa):
+    with open(file_name, 'w') as file:
+        file.write('# States\n')
+        for state in nfa.states:
+            file.write(state + '\n')
+        file.write('# Alphabet\n')
+        for symbol in nfa.alphabet:
+            file.write(symbol + '\n')
+        file.write('# Start\n')
+        file.write(nfa.start_state + '\n')
+        file.write('# Accept\n')
+        for state in nfa.accept_states:
+            file.write(state + '\n')
+        file.write('# Transitions\n')
+        for (from_state, symbol, to_state) in nfa.transitions:
+            file.write(f'{from_state} {symbol} {to_state}\n')
 
 #==================================== Designing NFA ====================================
+# Epsilon transitions are written with the symbol 'eps' in the file
+EPSILON = 'eps'
+
+# Inside the NFA every state is an integer id (its position in states) and the transitions on one symbol are stored
+# in compressed sparse rows: the next states of state i are targets[offsets[i]:offsets[i + 1]]. That is two arrays
+# of machine ints per symbol instead of a tuple of three strings per transition, and finding the next states of a
+# state costs O(out-degree). The eps arrows are kept in their own rows.
+class Rows:
+    __slots__ = ('offsets', 'targets')
+
+    # sources and targets are parallel arrays, one entry per arrow
+    def __init__(self, num_states, sources, targets):
+        self.offsets = array('i', [0]) * (num_states + 1)
+        for source in sources:
+            self.offsets[source + 1] += 1
+        for i in range(num_states):
+            self.offsets[i + 1] += self.offsets[i]
+        self.targets = array('i', [0]) * len(targets)
+        fill = self.offsets[:-1]
+        for source, target in zip(sources, targets):
+            self.targets[fill[source]] = target
+            fill[source] += 1
+
+    def out(self, state):
+        return self.targets[self.offsets[state]:self.offsets[state + 1]]
+
+    def out_degree(self, state):
+        return self.offsets[state + 1] - self.offsets[state]
+
 class NFA:
+    __slots__ = ('states', 'alphabet', 'start_state', 'accept_states', 'state_index', 'start',
+                 'accepting', 'rows', 'epsilon', 'closures', 'bitset')
+
     def __init__(self, states, alphabet, start_state, accept_states, transitions):
         self.states = states
         self.alphabet = alphabet
         self.start_state = start_state
         self.accept_states = accept_states
-        self.transitions = transitions
-        self.validate_transition_function()
-
-    # Validation function
-    def validate_transition_function(self):
-        transition_states = set()
-        for transition in self.transitions:
-            if transition[0] not in self.states or transition[2] not in self.states:
+        with phase('validate'):
+            arrows = self.validate_transition_function(transitions)
+        with phase('compile'):
+            self.build_index(arrows)
+        self.bitset = None    # the BitsetNFA, built the first time the bitset backend is used
+
+    # Validation function. Returns the transitions as ids: symbol -> (array of sources, array of targets)
+    def validate_transition_function(self, transitions):
+        self.state_index = {state: i for i, state in enumerate(self.states)}
+        arrows = {}
+        for (from_state, symbol, to_state) in transitions:
+            source, target = self.state_index.get(from_state), self.state_index.get(to_state)
+            if source is None or target is None:
                 raise Exception('Invalid transition states.')
-            transition_states.add((transition[0], transition[1]))
-        if len(transition_states) != len(self.transitions):
-            raise Exception('Duplicate transitions detected.')
+            if symbol not in arrows:
+                arrows[symbol] = (array('i'), array('i'))
+            arrows[symbol][0].append(source)
+            arrows[symbol][1].append(target)
+        for sources, _ in arrows.values():
+            if len(set(sources)) != len(sources):
+                raise Exception('Duplicate transitions detected.')
+        return arrows
+
+    # rows maps every symbol to its Rows, epsilon holds the eps arrows, and accepting[i] is 1 if state i accepts.
+    # The eps-closure of a state is only worked out the first time it is needed (see epsilon_reach).
+    def build_index(self, arrows):
+        n = len(self.states)
+        self.start = self.state_index.get(self.start_state, -1)
+        self.accepting = bytearray(n)
+        for state in self.accept_states:
+            if state in self.state_index:
+                self.accepting[self.state_index[state]] = 1
+        empty = (array('i'), array('i'))
+        self.epsilon = Rows(n, *arrows.pop(EPSILON, empty))
+        self.rows = {symbol: Rows(n, sources, targets) for symbol, (sources, targets) in arrows.items()}
+        self.closures = {}
+
+    # The transitions are not kept as a list; they are rebuilt from the rows when asked for
+    # (write_nfa_description, save_nfa, ...), state by state
+    @property
+    def transitions(self):
+        rows = list(self.rows.items()) + [(EPSILON, self.epsilon)]
+        return [(self.states[state], symbol, self.states[target])
+                for state in range(len(self.states)) for symbol, row in rows for target in row.out(state)]
+
+    # The ids reachable from state using only eps arrows (iterative dfs, so eps cycles and long eps chains are fine)
+    def epsilon_reach(self, state):
+        closure = self.closures.get(state)
+        if closure is None:
+            epsilon = self.epsilon
+            if epsilon.out_degree(state) == 0:
+                closure = frozenset([state])
+            else:
+                reached = {state}
+                stack = [state]
+                while stack:
+                    for next_state in epsilon.out(stack.pop()):
+                        if next_state not in reached:
+                            reached.add(next_state)
+                            stack.append(next_state)
+                closure = frozenset(reached)
+            self.closures[state] = closure
+        return closure
+
+    # The ids the NFA can be in at the start, and after reading symbol from the ids in current_states
+    def start_states(self):
+        return self.epsilon_reach(self.start) if self.start >= 0 else frozenset()
+
+    def step(self, current_states, symbol):
+        row = self.rows.get(symbol)
+        if row is None:
+            return set()
+        offsets, targets, closures = row.offsets, row.targets, self.closures
+        next_states = set()
+        for state in current_states:
+            begin, end = offsets[state], offsets[state + 1]
+            while begin < end:
+                next_state = targets[begin]
+                if next_state not in next_states:
+                    next_states |= closures.get(next_state) or self.epsilon_reach(next_state)
+                begin += 1
+        return next_states
+
+    def is_accepting(self, current_states):
+        accepting = self.accepting
+        return any(accepting[state] for state in current_states)
+
+    # The same as epsilon_reach and step, with state names instead of ids
+    def closure(self, state):
+        if state not in self.state_index:
+            return frozenset([state])
+        return frozenset(self.states[i] for i in self.epsilon_reach(self.state_index[state]))
 
     def transition(self, state, symbol):
-        possible_transitions = []
-        for transition in self.transitions:
-            if transition[0] == state and transition[1] == symbol:
-                possible_transitions.append(transition[2])
-        return possible_transitions
+        row = self.rows.get(symbol) if symbol != EPSILON else self.epsilon
+        if row is None or state not in self.state_index:
+            return []
+        return [self.states[i] for i in row.out(self.state_index[state])]
+
+    # Subset simulation: we keep the set of states the NFA can be in after reading each symbol.
+    # Every step looks at each active state once, so the whole run is O(n * |Q|) with no copies of the input.
+    # backend picks how the set of states is stored: 'sets' (python sets), 'bitset' (one int, see BitsetNFA below)
+    # or 'auto', which uses the bitset if the NFA has at most BITSET_MAX_STATES states and the sets otherwise.
+    def simulate(self, string, backend='auto'):
+        if profiling.active is not None:
+            return self.simulate_profiled(string, profiling.active)
+        if backend == 'bitset' or (backend == 'auto' and len(self.states) <= BITSET_MAX_STATES):
+            if self.bitset is None:
+                self.bitset = BitsetNFA(self)
+            return self.bitset.simulate(string)
+        step = self.step
+        current_states = self.start_states()
+        for symbol in string:
+            current_states = step(current_states, symbol)
+            if not current_states:
+                return False
+        return self.is_accepting(current_states)
+
+    # simulate, counting the arrows followed, the sizes of the eps-closures that were added and the largest number of
+    # states the NFA was in at once, for profiling.profile()
+    def simulate_profiled(self, string, stats):
+        with phase('simulate'):
+            stats.count('strings')
+            current_states = self.start_states()
+            stats.peak('active states', len(current_states))
+            taken, closure_sizes = 0, 0
+            for symbol in string:
+                row = self.rows.get(symbol)
+                next_states = set()
+                for state in current_states if row is not None else ():
+                    for next_state in row.out(state):
+                        taken += 1
+                        if next_state not in next_states:
+                            closure = self.epsilon_reach(next_state)
+                            closure_sizes += len(closure)
+                            next_states |= closure
+                current_states = next_states
+                stats.peak('active states', len(current_states))
+                if not current_states:
+                    break
+            stats.count('transitions', taken)
+            stats.count('closure states', closure_sizes)
+            accepted = self.is_accepting(current_states)
+            stats.count('accepted' if accepted else 'rejected')
+            return accepted
+
+# ==================================== Bitset NFA ====================================
+# The set of states is a single int: bit i is set if the NFA can be in state i. The eps-closures are folded into
+# the masks, so follow[symbol][i] is the set of states reached from state i by reading symbol and then following eps
+# arrows, and a step is the OR of follow[symbol][i] over the active states i.
+# To avoid looping over the active states one by one, the states are cut into bytes of 8: the current set is turned
+# into bytes once per step, and for every byte that holds states with a transition on the symbol, the OR of the masks
+# of the active ones is looked up by the value of the byte (and remembered the first time that value is seen). A step is then
+# a few lookups and ORs per 8 states, however many of them are active.
+# Above BITSET_MAX_STATES states the ints get long and 'auto' goes back to the set-based simulation.
+BITSET_MAX_STATES = 1024
+
+class BitsetNFA:
+    __slots__ = ('num_bytes', 'start', 'accept', 'follow', 'chunks')
+
+    def __init__(self, nfa):
+        n = len(nfa.states)
+        self.num_bytes = (n + 7) // 8
+
+        closure = [0] * n
+        for state in range(n):
+            for reachable in nfa.epsilon_reach(state):
+                closure[state] |= 1 << reachable
+        self.start = closure[nfa.start] if nfa.start >= 0 else 0
+        self.accept = 0
+        for state in range(n):
+            if nfa.accepting[state]:
+                self.accept |= 1 << state
+
+        self.follow = {}    # symbol -> {state id: mask}
+        for symbol, row in nfa.rows.items():
+            follow = self.follow[symbol] = {}
+            for state in range(n):
+                if row.out_degree(state):
+                    mask = 0
+                    for next_state in row.out(state):
+                        mask |= closure[next_state]
+                    follow[state] = mask
+        # symbol -> [(byte position, bits of the states in that byte that read the symbol, {byte value: mask})]
+        self.chunks = {}
+        for symbol, follow in self.follow.items():
+            bits = {}
+            for i in follow:
+                bits[i // 8] = bits.get(i // 8, 0) | 1 << (i % 8)
+            self.chunks[symbol] = [(position, bits[position], {}) for position in sorted(bits)]
+
+    def byte_mask(self, follow, position, value):
+        mask = 0
+        for bit in range(8):
+            if value >> bit & 1:
+                mask |= follow[position * 8 + bit]
+        return mask
+
+    def step(self, current_states, symbol):
+        chunks = self.chunks.get(symbol)
+        if chunks is None:
+            return 0
+        data = current_states.to_bytes(self.num_bytes, 'little')
+        next_states = 0
+        for position, bits, masks in chunks:
+            value = data[position] & bits
+            if value:
+                mask = masks.get(value)
+                if mask is None:
+                    mask = masks[value] = self.byte_mask(self.follow[symbol], position, value)
+                next_states |= mask
+        return next_states
 
     def simulate(self, string):
-        return self.accept(self.start_state, string)
-
-    def accept(self, state, string):
-        if len(string) == 0:
-            return state in self.accept_states
-        for next_state in self.transition(state, string[0]):
-            if self.accept(next_state, string[1:]):
-                return True
-        for next_state in self.transition(state, 'eps'):
-            if self.accept(next_state, string):
-                return True
-        return False
+        current_states = self.start
+        for symbol in string:
+            current_states = self.step(current_states, symbol)
+            if not current_states:
+                return False
+        return current_states & self.accept != 0
 
 # ==================================== Main Function ====================================
 def main():
     print('Welcome to the NFA simulator')
     file_name = 'nfa.txt'
 
-    if not check_file_format(file_name):
+    try:
+        states, alphabet, start_state, accept_states, transitions = read_nfa_description(file_name)
+    except AutomatonFormatError as error:
         print('The file is not in the correct format. Please check the file format and try again.')
+        print(error)
         print('The file should have the "# States" line, followed by the states, then the "# Alphabet" line, followed by the alphabet, then the "# Start" line, followed by the start state, then the "# Accept" line, followed by the accept states, then the "# Transitions" line, followed by the transitions')
         return
-    
-    states, alphabet, start_state, accept_states, transitions = read_nfa_description(file_name)
+    nfa = NFA(states, alphabet, start_state, accept_states, transitions)
     choice = input('Do you want to check if a string is in the language? (y/n) ')
 
     while choice == 'y':
         string = input('Enter a string to check if it is in the language: ')
-        nfa = NFA(states, alphabet, start_state, accept_states, transitions)
         result = nfa.simulate(string)
         if result:
             print('Yayy! The string is in the language generated by the NFA!🎉')
@@ -133,4 +322,5 @@ def main():
     print('Bye bye!')        
 
 # ==================================== Run ====================================
-main()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
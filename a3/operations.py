@@ -0,0 +1,243 @@
+'''
+Operations on automata (DFAs and NFAs):
+• intersection(a1, a2, ...): accepts x if every automaton accepts x
+• union(a1, a2, ...): accepts x if some automaton accepts x
+• complement(a): accepts x if the automaton rejects x
+• concatenation(a1, a2, ...): accepts x = x1 x2 ... if a1 accepts x1, a2 accepts x2, ...
+• star(a): accepts x = x1 x2 ... xk (k >= 0) if a accepts every xi
+• reversal(a): accepts x if the automaton accepts x backwards
+
+All of them return a CompiledDFA. The decision procedures do not build a DFA at all:
+• shortest_string(a): a shortest accepted string (as a list of symbols), or None if the language is empty
+• is_empty(a), is_universal(a)
+• distinguishing_string(a, b): a shortest string accepted by exactly one of a and b, or None
+• are_equivalent(a, b): L(a) = L(b)
+• product_string([a1, a2, ...], combine): a shortest string on which combine() holds for the accept values of the
+  automata, e.g. a string the password DFA and the five policy DFAs disagree on:
+
+    product_string([password] + policies, lambda accepted: accepted[0] != all(accepted[1:]))
+'''
+from dfa import CompiledDFA
+from nfa import NFA, EPSILON
+
+# ==================================== Runners ====================================
+# Every operation walks its automata one symbol at a time through a runner: start, step(state, symbol) and
+# accepting(state). A DFA state is its index in the table (-1 is the dead state, for a missing symbol or transition);
+# an NFA state is the frozenset of the ids of the NFA states it can be in (the empty set is the dead state), so an
+# NFA is determinized on the fly, only as far as an operation actually explores it.
+
+class DFARunner:
+    def __init__(self, dfa):
+        self.dfa = dfa
+        self.alphabet = list(dfa.alphabet)
+        self.start = dfa.start
+        self.dead = -1
+
+    def step(self, state, symbol):
+        return self.dfa.step(state, symbol)
+
+    def accepting(self, state):
+        return self.dfa.is_accepting(state)
+
+class NFARunner:
+    def __init__(self, nfa):
+        self.nfa = nfa
+        self.alphabet = [symbol for symbol in nfa.alphabet if symbol != EPSILON]
+        self.start = nfa.start_states()
+        self.dead = frozenset()
+
+    def step(self, state, symbol):
+        return frozenset(self.nfa.step(state, symbol))
+
+    def accepting(self, state):
+        return self.nfa.is_accepting(state)
+
+def runner(automaton):
+    if isinstance(automaton, NFA):
+        return NFARunner(automaton)
+    return DFARunner(automaton)
+
+def merged_alphabet(runners):
+    alphabet = []
+    for r in runners:
+        for symbol in r.alphabet:
+            if symbol not in alphabet:
+                alphabet.append(symbol)
+    return alphabet
+
+# ==================================== Exploration ====================================
+# Breadth-first search over the states reachable from start. A state can be any hashable value; the states of the
+# DFA that explore builds are named q0, q1, ... in the order they are discovered (q0 is the start state). Every
+# missing transition is explored too, so the result is a complete DFA over the alphabet.
+
+def explore(alphabet, start, step, accepting):
+    names = {start: 'q0'}
+    queue = [start]
+    accept_states = []
+    transitions = []
+
+    i = 0
+    while i < len(queue):
+        current = queue[i]
+        i += 1
+        if accepting(current):
+            accept_states.append(names[current])
+        for symbol in alphabet:
+            next_state = step(current, symbol)
+            if next_state not in names:
+                names[next_state] = f'q{len(names)}'
+                queue.append(next_state)
+            transitions.append((names[current], symbol, names[next_state]))
+
+    states = [names[current] for current in queue]
+    return CompiledDFA(states, list(alphabet), 'q0', accept_states, transitions)
+
+# inverse[symbol][q] lists the states (out of states) that move to q on symbol; symbols are column indices
+def inverse_table(states, num_symbols, next_state):
+    inverse = [{} for _ in range(num_symbols)]
+    for state in states:
+        for symbol in range(num_symbols):
+            inverse[symbol].setdefault(next_state(state, symbol), []).append(state)
+    return inverse
+
+# The same search, but it stops at the first state found() is true for and returns the symbols read to get there
+# (a shortest such string, since the search is breadth-first), or None if no reachable state is found.
+def find(alphabet, start, step, found):
+    parent = {start: None}    # state -> (previous state, symbol)
+    queue = [start]
+    i = 0
+    while i < len(queue):
+        current = queue[i]
+        i += 1
+        if found(current):
+            symbols = []
+            while parent[current] is not None:
+                current, symbol = parent[current]
+                symbols.append(symbol)
+            return symbols[::-1]
+        for symbol in alphabet:
+            next_state = step(current, symbol)
+            if next_state not in parent:
+                parent[next_state] = (current, symbol)
+                queue.append(next_state)
+    return None
+
+# ==================================== Product Construction ====================================
+# A state of the product is a tuple with one state of every automaton. Reading a symbol moves every automaton at
+# once, and combine() decides from the list of "is this one accepting?" values whether the tuple is accepting.
+# The automata may have different alphabets; the product runs over the union of the alphabets.
+
+def product_runner(automata):
+    runners = [runner(automaton) for automaton in automata]
+    start = tuple(r.start for r in runners)
+
+    def step(current, symbol):
+        return tuple(r.step(state, symbol) for r, state in zip(runners, current))
+
+    def accepted(current):
+        return [r.accepting(state) for r, state in zip(runners, current)]
+
+    return merged_alphabet(runners), start, step, accepted
+
+def product(automata, combine):
+    alphabet, start, step, accepted = product_runner(automata)
+    return explore(alphabet, start, step, lambda current: combine(accepted(current)))
+
+def intersection(*automata):
+    return product(automata, all)
+
+def union(*automata):
+    return product(automata, any)
+
+def complement(automaton):
+    return product([automaton], lambda accepted: not accepted[0])
+
+# ==================================== Concatenation, Star, Reversal ====================================
+# These are the usual NFA constructions (eps arrows from the accept states of one automaton to the start of the
+# next, ...) followed by the subset construction, done in one go: the subsets are built directly as the search
+# reaches them.
+
+# A state is a tuple with one set of states per automaton: the states automaton i can be in after reading some
+# split x1 ... xi of the input so far. Whenever automaton i is accepting, automaton i+1 may start.
+def concatenation(*automata):
+    runners = [runner(automaton) for automaton in automata]
+
+    def start_next(current):
+        current = list(current)
+        for i in range(len(runners) - 1):
+            if any(runners[i].accepting(state) for state in current[i]):
+                current[i + 1] = current[i + 1] | {runners[i + 1].start}
+        return tuple(current)
+
+    def step(current, symbol):
+        return start_next(tuple(frozenset(r.step(state, symbol) for state in states) - {r.dead}
+                                for r, states in zip(runners, current)))
+
+    def accepting(current):
+        return any(runners[-1].accepting(state) for state in current[-1])
+
+    first = (frozenset([runners[0].start]),) + tuple(frozenset() for _ in runners[1:])
+    return explore(merged_alphabet(runners), start_next(first), step, accepting)
+
+# A state is the set of states the automaton can be in, restarting it after every accepted piece. The start state is
+# kept apart (marked True) because it accepts the empty string even if the automaton does not.
+def star(automaton):
+    r = runner(automaton)
+
+    def step(current, symbol):
+        states = {r.step(state, symbol) for state in current[0]} - {r.dead}
+        if any(r.accepting(state) for state in states):
+            states.add(r.start)
+        return (frozenset(states), False)
+
+    def accepting(current):
+        return current[1] or any(r.accepting(state) for state in current[0])
+
+    return explore(r.alphabet, (frozenset([r.start]), True), step, accepting)
+
+# Run the automaton backwards: a state is the set of states from which the part of the input read so far (read
+# backwards) leads to acceptance. It starts at the accepting states and accepts if it contains the start state.
+# An NFA is made a DFA first (its reachable part), so the arrows can be reversed.
+def reversal(automaton):
+    dfa = automaton
+    if not isinstance(dfa, CompiledDFA):
+        r = runner(automaton)
+        dfa = explore(r.alphabet, r.start, r.step, r.accepting)
+    k = dfa.num_symbols
+    inverse = inverse_table(range(len(dfa.states)), k, lambda state, symbol: dfa.table[state * k + symbol])
+
+    def step(current, symbol):
+        column = inverse[dfa.symbol_index[symbol]]
+        return frozenset(from_state for state in current for from_state in column.get(state, ()))
+
+    start = frozenset(state for state in range(len(dfa.states)) if dfa.accepting[state])
+    return explore(list(dfa.alphabet), start, step, lambda current: dfa.start in current)
+
+# ==================================== Decision Procedures ====================================
+# All of them search the states reachable from the start (of the automaton, or of the product of two automata)
+# and stop at the first state that settles the question, so a counterexample near the start is found without
+# exploring the rest.
+
+def shortest_string(automaton):
+    r = runner(automaton)
+    return find(r.alphabet, r.start, r.step, r.accepting)
+
+def is_empty(automaton):
+    return shortest_string(automaton) is None
+
+# Universal over the alphabet of the automaton: every string of its symbols is accepted
+def is_universal(automaton):
+    r = runner(automaton)
+    return find(r.alphabet, r.start, r.step, lambda state: not r.accepting(state)) is None
+
+# A shortest string for which combine() is true of the "is this one accepting?" values of the automata (as in
+# product), without building the product
+def product_string(automata, combine):
+    alphabet, start, step, accepted = product_runner(automata)
+    return find(alphabet, start, step, lambda current: combine(accepted(current)))
+
+def distinguishing_string(automaton1, automaton2):
+    return product_string([automaton1, automaton2], lambda accepted: accepted[0] != accepted[1])
+
+def are_equivalent(automaton1, automaton2):
+    return distinguishing_string(automaton1, automaton2) is None
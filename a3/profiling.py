@@ -0,0 +1,89 @@
+'''
+Profiling:
+• Stats: timers per phase (parse, validate, simulate, ...) and counters (transitions taken, epsilon-closure sizes,
+  peak number of active states, cache hits, ...)
+• profile(): a context manager that collects a Stats for everything run inside it
+
+    with profile() as stats:
+        dfa = load_dfa('lenSix.txt')
+        simulate_dfa(dfa, 'abc12$')
+    print(stats.report())
+
+When no profile() is active nothing is collected: the simulators check once per call whether profiling is on and
+otherwise run their normal loops, and a phase timer is a shared do-nothing context manager.
+'''
+import time
+from contextlib import nullcontext, contextmanager
+
+# ==================================== Stats ====================================
+class Stats:
+    def __init__(self):
+        self.timers = {}      # phase -> [number of calls, total seconds]
+        self.counters = {}    # name -> total
+        self.peaks = {}       # name -> largest value seen
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def peak(self, name, value):
+        if value > self.peaks.get(name, 0):
+            self.peaks[name] = value
+
+    def add_time(self, phase, seconds):
+        timer = self.timers.setdefault(phase, [0, 0.0])
+        timer[0] += 1
+        timer[1] += seconds
+
+    def as_dict(self):
+        return {'timers': {phase: {'calls': calls, 'seconds': seconds} for phase, (calls, seconds) in self.timers.items()},
+                'counters': dict(self.counters), 'peaks': dict(self.peaks)}
+
+    def report(self):
+        lines = []
+        for phase, (calls, seconds) in sorted(self.timers.items(), key=lambda item: -item[1][1]):
+            lines.append(f'{phase:24} {calls:10} calls {seconds * 1000:12.3f} ms')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f'{name:24} {value:10}')
+        for name, value in sorted(self.peaks.items()):
+            lines.append(f'{name:24} {value:10} (peak)')
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return f'Stats({self.as_dict()})'
+
+# ==================================== Profiler ====================================
+# active is the Stats being collected, or None when profiling is off. Profiles can be nested; the inner one
+# collects until it ends and then the outer one goes on.
+active = None
+
+@contextmanager
+def profile(stats=None):
+    global active
+    previous = active
+    active = stats if stats is not None else Stats()
+    try:
+        yield active
+    finally:
+        active = previous
+
+class Timer:
+    __slots__ = ('stats', 'phase', 'start')
+
+    def __init__(self, stats, phase):
+        self.stats, self.phase = stats, phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self.stats
+
+    def __exit__(self, *exc_info):
+        self.stats.add_time(self.phase, time.perf_counter() - self.start)
+        return False
+
+NO_TIMER = nullcontext()
+
+# with phase('parse'): ... times the block if profiling is on, and does nothing otherwise
+def phase(name):
+    if active is None:
+        return NO_TIMER
+    return Timer(active, name)
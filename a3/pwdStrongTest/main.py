@@ -2,203 +2,40 @@
 # L = { w = w_1w_2 ... w_n \in {a,b,c,$,*,#,1,2,3} | n>= 6, w_i \in {1,2,3}, w_j \in {a,b,c}, w_k \in {$,*,#} for some 1 <= i,j,k <= n and the string doesn't contain 123 as a substring }
 
 
-# ==================================== Checking the file format ====================================
-#check if the file is in the correct format
-def check_file_format(file_name):
-    with open(file_name, 'r') as file:
-        lines = file.readlines()
-        if len(lines) < 5:
-            return False
-        #we need to check if there are lines starting with # States, # Alphabet, # Start, # Accept, # Transitions
-        states, alphabet, start, accept, transitions = False, False, False, False, False
-        for line in lines:
-            line = line.strip()
-            if line == '# States':
-                states = True
-            elif line == '# Alphabet':
-                alphabet = True
-            elif line == '# Start':
-                start = True
-            elif line == '# Accept':
-                accept = True
-            elif line == '# Transitions':
-                transitions = True
-        return states and alphabet and start and accept and transitions
-    
-#==================================== Reading the DFA ====================================
-# The file has the "# States" line, followed by the states, then the "# Alphabet" line, followed by the alphabet, then the "# Start" line, 
-# followed by the start state, then the "# Accept" line, followed by the accept states, then the "# Transitions" line, followed by the transitions
-
-def read_dfa_description(file_name):    
-    states = []
-    alphabet = []
-    start_state = ''
-    accept_states = []
-    transitions = []
-    with open(file_name, 'r') as file:
-        lines = file.readlines()
-        reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, False, False, False, False
-        for line in lines:
-            line = line.strip()
-            if line == '# States':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = True, False, False, False, False
-            elif line == '# Alphabet':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, True, False, False, False
-            elif line == '# Start':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, False, True, False, False
-            elif line == '# Accept':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, False, False, True, False
-            elif line == '# Transitions':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, False, False, False, True
-
-            elif reading_states:
-                states.append(line)
-            elif reading_alphabet:
-                alphabet.append(line)
-            elif reading_start:
-                start_state = line
-            elif reading_accept:
-                accept_states.append(line)
-            elif reading_transitions:
-                transition = line.split()
-                transitions.append((transition[0], transition[1], transition[2])) # (from, symbol, to)
-
-    return states, alphabet, start_state, accept_states, transitions
-
-def is_dfa(states, alphabet, start_state, accept_states, transitions):
-    # a dfa is a valid dfa if:
-    # 1. the start state is in the set of states
-    # 2. the accept states are a subset of the states
-    # 3. for each state and symbol, there is exactly one transition
-    # 4. the alphabet is not empty
-    if start_state not in states:
-        return False
-    if not set(accept_states).issubset(set(states)):
-        return False
-    if len(alphabet) == 0:
-        return False
-    for state in states:
-        for symbol in alphabet:
-            transitions_from_state = [t for t in transitions if t[0] == state and t[1] == symbol]
-            if len(transitions_from_state) != 1:
-                return False
-    return True
-
-# ==================================== Simulating the DFA ====================================
-def simulate_dfa(states, alphabet, start_state, accept_states, transitions, string):
-    current_state = start_state
-    for symbol in string:
-        if symbol not in alphabet:
-            return False
-        transition = [t for t in transitions if t[0] == current_state and t[1] == symbol][0]
-        current_state = transition[2]
-    
-    res = current_state in accept_states
-    if res:
-       return True
-    else:
-        return False
-
+import hashlib
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# the DFA and NFA code lives one directory up in dfa.py and nfa.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dfa import write_dfa_description, simulate_dfa
+from cache import load_dfa, load_nfa, file_hash
+from binary_format import save_dfa, load_dfa as map_dfa
+from operations import intersection, product_string
+from convert import minimize
+
+#==================================== DFA ====================================
+# The automata are parsed and validated once and then reused from the cache in cache.py (until their file changes),
+# so checking a word only costs the simulation.
 def mainDFA(file_name, word):
-    if not check_file_format(file_name):
+    dfa = load_dfa(file_name)
+    if dfa is None:
         return False
     
-    states, alphabet, start_state, accept_states, transitions = read_dfa_description(file_name)
-
-    if is_dfa(states, alphabet, start_state, accept_states, transitions) == False:
-        return False
-    
-    if (simulate_dfa(states, alphabet, start_state, accept_states, transitions, word)):
+    if (simulate_dfa(dfa, word)):
         return True
     else:
         return False
     
 #==================================== NFA ====================================
-#==================================== Reading the NFA ====================================
-def read_nfa_description(file_name):    
-    states = []
-    alphabet = []
-    start_state = ''
-    accept_states = []
-    transitions = []
-    with open(file_name, 'r') as file:
-        lines = file.readlines()
-        reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, False, False, False, False
-        for line in lines:
-            line = line.strip()
-            if line == '# States':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = True, False, False, False, False
-            elif line == '# Alphabet':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, True, False, False, False
-            elif line == '# Start':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, False, True, False, False
-            elif line == '# Accept':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, False, False, True, False
-            elif line == '# Transitions':
-                reading_states, reading_alphabet, reading_start, reading_accept, reading_transitions = False, False, False, False, True
-
-            elif reading_states:
-                states.append(line)
-            elif reading_alphabet:
-                alphabet.append(line)
-            elif reading_start:
-                start_state = line
-            elif reading_accept:
-                accept_states.append(line)
-            elif reading_transitions:
-                transition = line.split()
-                transitions.append((transition[0], transition[1], transition[2])) # (from, symbol, to)
-
-    return states, alphabet, start_state, accept_states, transitions
-
-#==================================== Designing NFA ====================================
-class NFA:
-    def __init__(self, states, alphabet, start_state, accept_states, transitions):
-        self.states = states
-        self.alphabet = alphabet
-        self.start_state = start_state
-        self.accept_states = accept_states
-        self.transitions = transitions
-        self.validate_transition_function()
-
-    # Validation function
-    def validate_transition_function(self):
-        transition_states = set()
-        for transition in self.transitions:
-            if transition[0] not in self.states or transition[2] not in self.states:
-                raise Exception('Invalid transition states.')
-            transition_states.add((transition[0], transition[1]))
-        if len(transition_states) != len(self.transitions):
-            raise Exception('Duplicate transitions detected.')
-
-    def transition(self, state, symbol):
-        possible_transitions = []
-        for transition in self.transitions:
-            if transition[0] == state and transition[1] == symbol:
-                possible_transitions.append(transition[2])
-        return possible_transitions
-
-    def simulate(self, string):
-        return self.accept(self.start_state, string)
-
-    def accept(self, state, string):
-        if len(string) == 0:
-            return state in self.accept_states
-        for next_state in self.transition(state, string[0]):
-            if self.accept(next_state, string[1:]):
-                return True
-        for next_state in self.transition(state, 'eps'):
-            if self.accept(next_state, string):
-                return True
-        return False
-
 def mainNFA(file_name, word):
-    if not check_file_format(file_name):
+    nfa = load_nfa(file_name)
+    if nfa is None:
         return False
-    
-    states, alphabet, start_state, accept_states, transitions = read_nfa_description(file_name)
 
-    nfa = NFA(states, alphabet, start_state, accept_states, transitions)
     result = nfa.simulate(word)
     if result:
         return True
@@ -241,9 +78,52 @@ def substring123(word):
     else:
         return False
     
+#==================================== Product DFA ====================================
+# Instead of running the five DFAs one after the other, we build their intersection once (product construction),
+# minimize it and save it in password.txt. A password is then decided by a single pass of one DFA.
+# password.hash holds the sha256 of the five DFA files password.txt was built from (as in cache.py), so it is rebuilt
+# whenever one of them changes, whatever the mtimes say. It is also rebuilt if it is not a valid DFA.
+# Both files are generated, they are not in git.
+POLICY_FILES = ['lenSix.txt', 'wi.txt', 'wj.txt', 'wk.txt', 'substring123.txt']
+PASSWORD_DFA_FILE = 'password.txt'
+PASSWORD_HASH_FILE = 'password.hash'
+
+def policy_hash():
+    digest = hashlib.sha256()
+    for file_name in POLICY_FILES:
+        digest.update(f'{file_name} {file_hash(file_name)}\n'.encode())
+    return digest.hexdigest()
+
+def build_password_dfa():
+    dfas = []
+    for file_name in POLICY_FILES:
+        dfa = load_dfa(file_name)
+        if dfa is None:
+            raise Exception(f'The file {file_name} does not describe a valid DFA.')
+        dfas.append(dfa)
+    return minimize(intersection(*dfas))
+
+def load_password_dfa():
+    digest = policy_hash()
+    try:
+        with open(PASSWORD_HASH_FILE) as file:
+            saved = file.read().strip()
+    except OSError:
+        saved = None
+    if saved == digest and os.path.exists(PASSWORD_DFA_FILE):
+        dfa = load_dfa(PASSWORD_DFA_FILE)    # None if it is not a valid DFA
+        if dfa is not None:
+            return dfa
+    dfa = build_password_dfa()
+    write_dfa_description(PASSWORD_DFA_FILE, dfa)
+    with open(PASSWORD_HASH_FILE, 'w') as file:
+        file.write(digest + '\n')
+    return dfa
+
 def main():
+    password_dfa = load_password_dfa()
     word = input("Enter a string: ")
-    res = lenSix(word) and wi(word) and wj(word) and wk(word) and substring123(word)
+    res = simulate_dfa(password_dfa, word)
     if res:
         print("The string {} is accepted by the language".format(word))
         print("#=======================================================")
@@ -251,6 +131,107 @@ def main():
         print("The string {} is not accepted by the language".format(word))
         print("#=======================================================")
 
+#==================================== Verifying ====================================
+# python main.py --verify
+# Checks offline that password.txt accepts exactly the passwords the five DFAs accept together. The check walks
+# password.txt and the five DFAs side by side and stops at the first string they disagree on, so the intersection
+# itself is never built.
+def verify():
+    dfas = []
+    for file_name in POLICY_FILES:
+        dfa = load_dfa(file_name)
+        if dfa is None:
+            print(f'The file {file_name} does not describe a valid DFA.')
+            return False
+        dfas.append(dfa)
+    dfas.append(load_password_dfa())
+    string = product_string(dfas, lambda accepted: all(accepted[:-1]) != accepted[-1])
+    if string is None:
+        print(f'{PASSWORD_DFA_FILE} accepts the same passwords as {", ".join(POLICY_FILES)}')
+        return True
+    print(f'{PASSWORD_DFA_FILE} and the policy DFAs disagree on {"".join(string)!r}')
+    return False
+
+#==================================== Batch Mode ====================================
+# python main.py --batch [file] [--workers n]
+# Reads one password per line from the file (or from stdin if no file is given) and writes "accept" or "reject" for
+# every line, in the same order. The lines are read in chunks of CHUNK_SIZE and the chunks are checked in parallel by
+# a pool of processes. The product DFA is saved once in the binary format (password.bin) and every process
+# memory-maps that file, so all of them run on one shared copy of the transition table. Only a few chunks per
+# process are in flight at any time, so the input is streamed instead of being read into memory all at once.
+# The number of passwords checked and the throughput are reported on stderr at the end.
+CHUNK_SIZE = 10000
+PASSWORD_BINARY_FILE = 'password.bin'
+
+worker_dfa = None
+
+def init_worker(file_name):
+    global worker_dfa
+    worker_dfa = map_dfa(file_name)
+
+def check_chunk(words):
+    return ['accept' if worker_dfa.accepts(word) else 'reject' for word in words]
+
+def read_chunks(file, chunk_size):
+    chunk = []
+    for line in file:
+        chunk.append(line.rstrip('\r\n'))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def batch(in_file, out_file, workers=None, chunk_size=CHUNK_SIZE):
+    password_dfa = load_password_dfa()
+    save_dfa(PASSWORD_BINARY_FILE, password_dfa)    # a few KB, so it always matches password.txt and the format version
+    workers = workers or os.cpu_count() or 1
+    total, accepted = 0, 0
+    start_time = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(os.path.abspath(PASSWORD_BINARY_FILE),)) as pool:
+        pending = deque()
+
+        def write_oldest():
+            nonlocal total, accepted
+            results = pending.popleft().result()
+            total += len(results)
+            accepted += results.count('accept')
+            out_file.write('\n'.join(results) + '\n')
+
+        for chunk in read_chunks(in_file, chunk_size):
+            pending.append(pool.submit(check_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                write_oldest()
+        while pending:
+            write_oldest()
+    out_file.flush()
+
+    elapsed = time.perf_counter() - start_time
+    rate = total / elapsed if elapsed > 0 else float('inf')
+    print(f'Checked {total} passwords ({accepted} accepted) in {elapsed:.2f}s: {rate:.0f} passwords/s', file=sys.stderr)
+
+def main_batch(args):
+    workers = None
+    if '--workers' in args:
+        i = args.index('--workers')
+        if i + 1 >= len(args) or not args[i + 1].isdigit() or int(args[i + 1]) < 1:
+            print('Usage: python main.py --batch [file] [--workers n]')
+            return
+        workers = int(args[i + 1])
+        args = args[:i] + args[i + 2:]
+    if len(args) > 1:
+        print('Usage: python main.py --batch [file] [--workers n]')
+        return
+
+    # a line that is not valid utf-8 is read with surrogate escapes; no symbol matches them, so it is rejected
+    if args:
+        with open(args[0], 'r', errors='surrogateescape') as file:
+            batch(file, sys.stdout, workers)
+    else:
+        sys.stdin.reconfigure(errors='surrogateescape')
+        batch(sys.stdin, sys.stdout, workers)
+
 #==================================== Testing ====================================
 # word = ["abc12$", "abc#3*", "123abc", "123abc$", "12abc#3$*", "1#3abc12"]
 
@@ -258,4 +239,10 @@ def main():
 #     main(words)
 
 #==================================== Running the program ====================================
-main()
+if __name__ == '__main__':
+    if '--batch' in sys.argv[1:]:
+        main_batch([arg for arg in sys.argv[1:] if arg != '--batch'])
+    elif '--verify' in sys.argv[1:]:
+        sys.exit(0 if verify() else 1)
+    else:
+        main()
@@ -0,0 +1,239 @@
+'''
+Automaton server:
+• Loads a set of named DFAs, NFAs and regexes once
+• Answers membership queries over a Unix socket (one JSON request per line) or over HTTP on localhost
+
+python server.py --dfa password=pwdStrongTest/password.txt --nfa example=nfa.txt --regex ends001='(0|1)*001' --unix /tmp/automata.sock
+python server.py ... --port 8349          (HTTP: POST /match with a JSON request, GET /automata)
+
+Requests and answers are JSON objects:
+    {"automaton": "password", "string": "abc12$"}            -> {"result": true}
+    {"automaton": "password", "strings": ["abc12$", "a"]}    -> {"results": [true, false]}
+    {"op": "list"}                                           -> {"automata": {"password": "dfa", ...}}
+A request that cannot be answered gets {"error": "..."}.
+'''
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import stat
+from concurrent.futures import ProcessPoolExecutor
+
+from cache import load_dfa, load_nfa
+
+# ==================================== Automata ====================================
+# The regex engine lives in a4/main.py; it is loaded under its own name so it does not clash with other main modules
+A4_MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'a4', 'main.py')
+
+def load_regex_engine():
+    spec = importlib.util.spec_from_file_location('regex', A4_MAIN)
+    engine = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(engine)
+    return engine
+
+# name -> (kind, function that checks one string). Built once per process: in the server and in every worker.
+class Registry:
+    def __init__(self, dfas, nfas, regexes):
+        self.automata = {}
+        for name, file_name in dfas.items():
+            dfa = load_dfa(file_name)
+            if dfa is None:
+                raise Exception(f'The file {file_name} does not describe a valid DFA.')
+            self.add(name, 'dfa', dfa.accepts)
+        for name, file_name in nfas.items():
+            nfa = load_nfa(file_name)
+            if nfa is None:
+                raise Exception(f'The file {file_name} does not describe a valid NFA.')
+            self.add(name, 'nfa', nfa.simulate)
+        if regexes:
+            engine = load_regex_engine()
+            for name, regex in regexes.items():
+                self.add(name, 'regex', engine.compiled_regex(regex).fullmatch)
+
+    def add(self, name, kind, check):
+        if name in self.automata:
+            raise Exception(f'The name {name} is used twice.')
+        self.automata[name] = (kind, check)
+
+    def check(self, name, strings):
+        check = self.automata[name][1]
+        return [bool(check(string)) for string in strings]
+
+# ==================================== Workers ====================================
+# Every worker process builds its own registry once, when it starts, and then only receives (name, strings)
+registry = None
+
+def init_worker(config):
+    global registry
+    registry = Registry(*config)
+
+def check_chunk(name, strings):
+    return registry.check(name, strings)
+
+# ==================================== Server ====================================
+# Small requests are answered right away in the event loop (a few microseconds per string, no inter-process
+# round trip). A batch of at least batch_threshold strings is split into chunks that the worker pool checks in
+# parallel, so one large batch does not hold up the other clients.
+
+MAX_REQUEST = 1 << 26    # bytes; a request line (a batch of strings) can be up to 64 MB
+
+class Server:
+    def __init__(self, config, workers=None, batch_threshold=1000, chunk_size=10000):
+        self.registry = Registry(*config)
+        self.batch_threshold = batch_threshold
+        self.chunk_size = chunk_size
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(workers, initializer=init_worker, initargs=(config,)) if workers > 0 else None
+
+    async def check(self, name, strings):
+        if self.pool is None or len(strings) < self.batch_threshold:
+            return self.registry.check(name, strings)
+        loop = asyncio.get_running_loop()
+        chunks = [strings[i:i + self.chunk_size] for i in range(0, len(strings), self.chunk_size)]
+        parts = await asyncio.gather(*(loop.run_in_executor(self.pool, check_chunk, name, chunk) for chunk in chunks))
+        return [result for part in parts for result in part]
+
+    async def answer(self, request):
+        if not isinstance(request, dict):
+            return {'error': 'A request must be a JSON object.'}
+        op = request.get('op', 'match')
+        if op == 'list':
+            return {'automata': {name: kind for name, (kind, _) in self.registry.automata.items()}}
+        if op != 'match':
+            return {'error': f'Unknown op {op!r}, it should be "match" or "list".'}
+
+        name = request.get('automaton')
+        if not isinstance(name, str) or name not in self.registry.automata:
+            return {'error': f'There is no automaton named {name!r}.'}
+        if 'string' in request:
+            if not isinstance(request['string'], str):
+                return {'error': '"string" must be a string.'}
+            return {'result': self.registry.check(name, [request['string']])[0]}
+        strings = request.get('strings')
+        if not isinstance(strings, list) or not all(isinstance(string, str) for string in strings):
+            return {'error': 'The request needs a "string" or a list of "strings".'}
+        return {'results': await self.check(name, strings)}
+
+    async def answer_text(self, text):
+        try:
+            request = json.loads(text)
+        except ValueError as error:
+            return {'error': f'The request is not valid JSON: {error}'}
+        return await self.answer(request)
+
+    # Unix socket: one JSON request per line, one JSON answer per line, as many as the client wants
+    async def handle_lines(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                answer = await self.answer_text(line)
+                writer.write(json.dumps(answer).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, ValueError):    # ValueError: a line longer than MAX_REQUEST
+            pass
+        finally:
+            writer.close()
+
+    # HTTP/1.1 with keep-alive: POST /match takes a request as the body, GET /automata is the same as {"op": "list"}
+    # A body longer than MAX_REQUEST is not read: the answer is 413 and the connection is closed.
+    async def handle_http(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                if length > MAX_REQUEST:
+                    await self.respond(writer, '413 Content Too Large', {'error': f'The body is longer than {MAX_REQUEST} bytes.'})
+                    break
+                body = await reader.readexactly(length)
+
+                parts = request_line.decode('latin-1').split()
+                method, path = (parts[0], parts[1]) if len(parts) >= 2 else ('', '')
+                if method == 'POST' and path == '/match':
+                    status, answer = '200 OK', await self.answer_text(body)
+                elif method == 'GET' and path == '/automata':
+                    status, answer = '200 OK', await self.answer({'op': 'list'})
+                else:
+                    status, answer = '404 Not Found', {'error': 'Use POST /match or GET /automata.'}
+                if 'error' in answer and status == '200 OK':
+                    status = '400 Bad Request'
+
+                await self.respond(writer, status, answer)
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, answer):
+        payload = json.dumps(answer).encode()
+        writer.write(f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n'.encode() + payload)
+        await writer.drain()
+
+    async def serve(self, unix_path=None, port=None):
+        if unix_path is not None:
+            if os.path.exists(unix_path):
+                # only a socket left by an earlier run is removed, never a file given by mistake
+                if not stat.S_ISSOCK(os.stat(unix_path).st_mode):
+                    raise Exception(f'{unix_path} exists and is not a socket.')
+                os.remove(unix_path)
+            server = await asyncio.start_unix_server(self.handle_lines, path=unix_path, limit=MAX_REQUEST)
+            print(f'Serving {len(self.registry.automata)} automata on {unix_path}')
+        else:
+            server = await asyncio.start_server(self.handle_http, host='127.0.0.1', port=port, limit=MAX_REQUEST)
+            print(f'Serving {len(self.registry.automata)} automata on http://127.0.0.1:{port}')
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+# ==================================== Main Function ====================================
+def named(value):
+    name, separator, target = value.partition('=')
+    if not separator or not name or not target:
+        raise argparse.ArgumentTypeError(f'{value!r} should be name=value')
+    return name, target
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve membership queries for DFAs, NFAs and regexes.')
+    parser.add_argument('--dfa', type=named, action='append', default=[], metavar='NAME=FILE')
+    parser.add_argument('--nfa', type=named, action='append', default=[], metavar='NAME=FILE')
+    parser.add_argument('--regex', type=named, action='append', default=[], metavar='NAME=REGEX')
+    where = parser.add_mutually_exclusive_group(required=True)
+    where.add_argument('--unix', metavar='PATH', help='listen on a Unix socket (JSON lines)')
+    where.add_argument('--port', type=int, help='listen for HTTP on 127.0.0.1:PORT')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes for large batches (0 = none)')
+    parser.add_argument('--batch-threshold', type=int, default=1000, help='batches at least this large go to the workers')
+    args = parser.parse_args()
+
+    config = (dict(args.dfa), dict(args.nfa), dict(args.regex))
+    server = Server(config, args.workers, args.batch_threshold)
+    try:
+        asyncio.run(server.serve(args.unix, args.port))
+    except KeyboardInterrupt:
+        pass
+    except Exception as error:
+        print(error)
+    finally:
+        server.close()
+
+# ==================================== Run ====================================
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+'''
+Streaming simulation:
+• Input: A DFA M (or an NFA N) and a string x that arrives in chunks
+• Output: Accept if x ∈ L(M), otherwise reject
+
+simulate_dfa and NFA.simulate need the whole string at once. A matcher keeps only the current state(s):
+feed(chunk) reads the next chunk, is_accepting says whether the input read so far is in the language, and
+finish() ends the input and returns the answer. So a stream of any size is checked in constant memory.
+'''
+import codecs
+
+# ==================================== Matchers ====================================
+# Chunks can be str or bytes. Bytes are decoded with an incremental decoder, so a character that is split between
+# two chunks is read once both halves have arrived. Once the automaton is stuck (no next state) the rest of the input
+# is not looked at anymore, it can only be rejected.
+
+class Matcher:
+    def __init__(self, encoding='utf-8'):
+        self.encoding = encoding
+        self.reset()
+
+    def reset(self):
+        self.decoder = codecs.getincrementaldecoder(self.encoding)()
+        self.length = 0    # number of symbols read so far
+        self.finished = False
+        self.start()
+
+    def feed(self, chunk):
+        if self.finished:
+            raise Exception('The input has already been finished. Call reset() to check another input.')
+        if not isinstance(chunk, str):
+            chunk = self.decoder.decode(chunk)
+        self.length += len(chunk)
+        if not self.stuck:
+            self.read(chunk)
+
+    def finish(self):
+        if not self.finished:
+            self.feed(self.decoder.decode(b'', final=True))
+            self.finished = True
+        return self.is_accepting
+
+class DFAMatcher(Matcher):
+    def __init__(self, dfa, encoding='utf-8'):
+        self.dfa = dfa
+        super().__init__(encoding)
+
+    def start(self):
+        self.state = self.dfa.start
+
+    @property
+    def stuck(self):
+        return self.state < 0
+
+    def read(self, chunk):
+        table, symbol_index, n = self.dfa.table, self.dfa.symbol_index, self.dfa.num_symbols
+        current_state = self.state
+        for symbol in chunk:
+            symbol = symbol_index.get(symbol)
+            if symbol is None:
+                current_state = -1
+                break
+            current_state = table[current_state * n + symbol]
+            if current_state < 0:
+                break
+        self.state = current_state
+
+    @property
+    def is_accepting(self):
+        return self.dfa.is_accepting(self.state)
+
+class NFAMatcher(Matcher):
+    def __init__(self, nfa, encoding='utf-8'):
+        self.nfa = nfa
+        super().__init__(encoding)
+
+    def start(self):
+        self.states = self.nfa.start_states()
+
+    @property
+    def stuck(self):
+        return not self.states
+
+    def read(self, chunk):
+        step = self.nfa.step
+        current_states = self.states
+        for symbol in chunk:
+            current_states = step(current_states, symbol)
+            if not current_states:
+                break
+        self.states = current_states
+
+    @property
+    def is_accepting(self):
+        return self.nfa.is_accepting(self.states)
+
+# ==================================== Reading a Stream ====================================
+# Feeds a matcher from a file object (anything with read) or a socket (anything with recv) until the end of the
+# stream, one chunk of chunk_size at a time, and returns whether the whole stream is accepted.
+# The stream is read to the end even if the matcher gets stuck, so a socket is not left half read.
+
+CHUNK_SIZE = 1 << 16
+
+def match_stream(matcher, stream, chunk_size=CHUNK_SIZE):
+    read = stream.recv if hasattr(stream, 'recv') else stream.read
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        matcher.feed(chunk)
+    return matcher.finish()
@@ -0,0 +1,136 @@
+'''
+Multi-character symbols and symbol classes:
+• tokenize(string, alphabet, separator=None): splits a string into symbols of the alphabet
+• CompressedDFA(states, alphabet, start, accept, transitions): a DFA whose table has one column per class of
+  symbols that behave the same, instead of one column per symbol
+
+The simulators read their input one item at a time, so a list of symbols can be passed to simulate_dfa,
+NFA.simulate or CompressedDFA.accepts instead of a string; tokenize makes that list when the alphabet has symbols
+longer than one character (like "if", "then", "<=" or whole words).
+'''
+from array import array
+
+from automaton_format import parse_automaton
+
+# ==================================== Tokenizing ====================================
+# With a separator the string is split on it ("if x then y" with separator ' ').
+# Otherwise the longest symbol is taken at every position (as in a lexer, so with the symbols "<" and "<=" the string
+# "<=<" is ["<=", "<"]) unless the rest of the string cannot be split after it: with the symbols "a", "ab" and "bc"
+# the string "abc" is ["a", "bc"]. Returns None if the string cannot be split into symbols at all.
+
+def tokenize(string, alphabet, separator=None):
+    symbols = set(alphabet)
+    return split_symbols(string, symbols, symbol_lengths(symbols), separator)
+
+def symbol_lengths(symbols):
+    return sorted({len(symbol) for symbol in symbols if symbol}, reverse=True)
+
+def split_symbols(string, symbols, lengths, separator=None):
+    if separator is not None:
+        tokens = [token for token in string.split(separator) if token]
+        return tokens if all(token in symbols for token in tokens) else None
+
+    # choice[i] is the length of the symbol taken at position i: the longest symbol there after which string[i:]
+    # can still be split, or 0 if there is none. Filled from the end, so the string is read O(number of lengths) times.
+    n = len(string)
+    choice = [0] * (n + 1)
+    for i in range(n - 1, -1, -1):
+        for length in lengths:
+            end = i + length
+            if end <= n and (end == n or choice[end]) and string[i:end] in symbols:
+                choice[i] = length
+                break
+    if n and not choice[0]:
+        return None
+
+    tokens = []
+    i = 0
+    while i < n:
+        tokens.append(string[i:i + choice[i]])
+        i += choice[i]
+    return tokens
+
+# ==================================== Symbol Classes ====================================
+# Two symbols are in the same class if every state goes to the same next state on both of them (like the byte
+# classes of RE2). The DFA only needs one column per class: symbol_class maps a symbol to its column, and the
+# table is |Q| x (number of classes). A DFA over thousands of characters that only cares about a few kinds of them
+# (digits, letters, everything else) ends up with a handful of columns.
+# The columns are built one symbol at a time straight from the transitions and only the distinct ones are kept,
+# so the full |Q| x |Σ| table never exists. A missing transition is -1, as in CompiledDFA.
+
+class CompressedDFA:
+    def __init__(self, states, alphabet, start_state, accept_states, transitions):
+        self.states = states
+        self.alphabet = alphabet
+        self.start_state = start_state
+        self.accept_states = accept_states
+        self.lengths = None    # lengths of the symbols, longest first, for accepts_text
+        n = len(states)
+        state_index = {state: i for i, state in enumerate(states)}
+        self.start = state_index.get(start_state, -1)
+        self.accepting = bytearray(n)    # accepting[i] is 1 if state i accepts
+        for state in accept_states:
+            if state in state_index:
+                self.accepting[state_index[state]] = 1
+
+        by_symbol = {symbol: [] for symbol in alphabet}
+        for (from_state, symbol, to_state) in transitions:
+            if symbol in by_symbol and from_state in state_index and to_state in state_index:
+                by_symbol[symbol].append((state_index[from_state], state_index[to_state]))
+
+        class_of_column = {}    # bytes of a column -> class
+        columns = []
+        self.symbol_class = {}
+        self.classes = []       # the symbols of every class
+        for symbol in alphabet:
+            column = array('i', [-1]) * n
+            for (from_state, to_state) in by_symbol.pop(symbol):
+                column[from_state] = to_state
+            key = column.tobytes()
+            c = class_of_column.get(key)
+            if c is None:
+                c = class_of_column[key] = len(columns)
+                columns.append(column)
+                self.classes.append([])
+            self.symbol_class[symbol] = c
+            self.classes[c].append(symbol)
+
+        # row-major table: the next state of (state, class) is at table[state * num_classes + class]
+        self.num_classes = len(columns)
+        self.table = array('i', [-1]) * (n * self.num_classes)
+        for c, column in enumerate(columns):
+            self.table[c::self.num_classes] = column
+
+    def __iter__(self):
+        transitions = [(self.states[q], symbol, self.states[self.table[q * self.num_classes + c]])
+                       for q in range(len(self.states)) for c, symbols in enumerate(self.classes) for symbol in symbols
+                       if self.table[q * self.num_classes + c] >= 0]
+        return iter((self.states, self.alphabet, self.start_state, self.accept_states, transitions))
+
+    def is_accepting(self, state):
+        return state >= 0 and self.accepting[state] == 1
+
+    # symbols is a string (one symbol per character) or a list of symbols (see tokenize)
+    def accepts(self, symbols):
+        table, symbol_class, k = self.table, self.symbol_class, self.num_classes
+        current_state = self.start
+        if current_state < 0:
+            return False
+        for symbol in symbols:
+            c = symbol_class.get(symbol)
+            if c is None:
+                return False
+            current_state = table[current_state * k + c]
+            if current_state < 0:
+                return False
+        return self.accepting[current_state] == 1
+
+    # tokenizes the string with the alphabet of the DFA first; a string that cannot be tokenized is rejected
+    def accepts_text(self, string, separator=None):
+        if self.lengths is None:
+            self.lengths = symbol_lengths(self.symbol_class)
+        tokens = split_symbols(string, self.symbol_class, self.lengths, separator)
+        return tokens is not None and self.accepts(tokens)
+
+def read_compressed_dfa(file_name):
+    return CompressedDFA(*parse_automaton(file_name))
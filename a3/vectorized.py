@@ -0,0 +1,109 @@
+'''
+Vectorized DFA simulation (needs numpy):
+• Input: A CompiledDFA M and a list of strings x_1, ..., x_m
+• Output: A boolean numpy array whose i-th entry is True if x_i ∈ L(M)
+
+Instead of running the DFA on one string at a time, all the strings are run together:
+1. The strings are sorted by length and encoded as padded matrices of symbol indices, one row per string
+2. At step t every string reads its t-th symbol at once, with one fancy-indexing lookup in the transition table
+3. After the last column we look up which of the final states are accepting
+'''
+import numpy as np
+
+# ==================================== Transition Table ====================================
+# The table of the CompiledDFA is turned into a (|Q| + 1) x (|Σ| + 2) numpy array:
+# • row |Q| is a dead state, every missing transition (-1) goes there and it never leaves it
+# • column |Σ| is used for characters that are not in the alphabet, it goes to the dead state
+# • column |Σ| + 1 is the padding after the end of a shorter string, it keeps every state where it is
+# The symbols of the alphabet are compared to the characters of the strings (as in CompiledDFA.accepts),
+# so a symbol with more than one character can never be read.
+
+BLOCK_SIZE = 1 << 16    # at most this many strings are run together
+
+def build_table(dfa):
+    n, k = len(dfa.states), dfa.num_symbols
+    dead, unknown, padding = n, k, k + 1
+    table = np.full((n + 1, k + 2), dead, dtype=np.int32)
+    if n > 0 and k > 0:
+        table[:n, :k] = np.frombuffer(dfa.table, dtype=np.int32).reshape(n, k)
+        table[table < 0] = dead
+    table[:, padding] = np.arange(n + 1, dtype=np.int32)
+
+    accepting = np.zeros(n + 1, dtype=bool)
+    accepting[:n] = np.frombuffer(bytes(dfa.accepting), dtype=np.uint8) != 0
+
+    # lookup[c] is the column of the character with code point c; every code point past the largest symbol
+    # is clipped to the last entry, which is the unknown column
+    symbols = {ord(symbol): i for symbol, i in dfa.symbol_index.items() if len(symbol) == 1}
+    lookup = np.full(max(symbols, default=-1) + 2, unknown, dtype=np.int32)
+    for code, i in symbols.items():
+        lookup[code] = i
+    return table, accepting, lookup, padding
+
+# ==================================== Encoding ====================================
+# All the strings of a block are joined and decoded to an array of code points (utf-32), which are mapped to
+# columns of the table with one lookup. They are then scattered into a matrix padded with the padding column.
+# Lone surrogates (from input read with surrogate escapes) are encoded as they are; no symbol is a surrogate, so
+# they map to the unknown column and the string is rejected, as in dfa.accepts.
+# The matrix is stored transposed (one row per position), so the symbols read at one step are contiguous.
+
+def encode(strings, lookup, padding):
+    lengths = np.array(list(map(len, strings)), dtype=np.int64)
+    width = int(lengths.max()) if len(strings) > 0 else 0
+    matrix = np.full((width, len(strings)), padding, dtype=np.int32)
+    if width == 0:
+        return matrix
+
+    text = np.frombuffer(''.join(strings).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    symbols = lookup[np.minimum(text, len(lookup) - 1)]
+
+    # the transpose is a view, so this fills the positions of each string in order
+    matrix.T[np.arange(width) < lengths[:, None]] = symbols
+    return matrix
+
+# ==================================== Blocks ====================================
+# Every string of a block is padded to the longest one, so the strings are sorted by length first and a block only
+# takes strings of about the same length: it grows until it has block_size strings or its matrix would have more
+# than MAX_CELLS entries. A string longer than MAX_WIDTH is run on its own with dfa.accepts, so one very long line
+# never makes a wide matrix of padding for all the short ones.
+
+MAX_CELLS = 1 << 22    # entries of one padded matrix (16 MB of int32)
+MAX_WIDTH = 1 << 12    # longer strings are not run in a batch
+
+def blocks(lengths, order, block_size):
+    begin = 0
+    while begin < len(order):
+        # the largest m with m * (length of the m-th shortest string) <= MAX_CELLS; it is at least 1
+        low, high = 1, min(block_size, len(order) - begin)
+        while low < high:
+            m = (low + high + 1) // 2
+            if m * lengths[order[begin + m - 1]] <= MAX_CELLS:
+                low = m
+            else:
+                high = m - 1
+        yield order[begin:begin + low]
+        begin += low
+
+# ==================================== Simulating the DFA ====================================
+def simulate_dfa_batch(dfa, strings, block_size=BLOCK_SIZE):
+    strings = list(strings)
+    result = np.zeros(len(strings), dtype=bool)
+    if dfa.start < 0:
+        return result
+
+    lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+    for i in np.flatnonzero(lengths > MAX_WIDTH):
+        result[i] = dfa.accepts(strings[i])
+    order = np.argsort(lengths, kind='stable')
+    order = order[lengths[order] <= MAX_WIDTH]
+
+    table, accepting, lookup, padding = build_table(dfa)
+    row_length = table.shape[1]
+    table = table.ravel()
+    for block in blocks(lengths, order, block_size):
+        matrix = encode([strings[i] for i in block], lookup, padding)
+        current_states = np.full(len(block), dfa.start, dtype=np.int32)
+        for symbols in matrix:
+            current_states = table[current_states * row_length + symbols]
+        result[block] = accepting[current_states]
+    return result
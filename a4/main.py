@@ -1,41 +1,165 @@
-# ===================================== Shunting Yard Algorithm =====================================
-def shunt(regex):
-  # Precedence of the operators
-  # * - Kleene closure
-  # + - Positive closure
-  # ? - Optional
-  # . - concatenation
-  # | - union/or
-  symbols = {'*': 5, '+': 4, '?': 3, '.': 2, '|': 1}
-
-  postfix = ""
-  stack = ""
-
-  for character in regex:
-    if character == '(':
-      stack = stack + character
-    elif character == ')':
-      while stack[-1] != '(':
-        postfix = postfix + stack[-1]
-        stack = stack[:-1] 
-      stack = stack[:-1]
-
-    elif character in symbols:
-      while stack and symbols.get(character, 0) <= symbols.get(stack[-1], 0):
-        postfix, stack = postfix + stack[-1], stack[:-1]
-      stack = stack + character
-
+import codecs
+from array import array
+from collections import OrderedDict
+
+# ===================================== Tokenizer =====================================
+# Turns the regex into a list of tokens (kind, value):
+#  - ("char", c)      a character to read. A backslash makes the next character literal, so \* reads a star
+#  - ("class", chars) a character class: [01] reads 0 or 1, and a-z inside the brackets is the range of characters
+#  - ("op", c)        one of the operators * + ? . |, or a parenthesis
+# Concatenation can be written with "." or left out: between two tokens that end and start an operand
+# (like "0" and "(" in "0(1|0)") the tokenizer inserts the "." itself.
+OPERATORS = "*+?.|"
+
+def tokenize(regex):
+  tokens = []
+  i, n = 0, len(regex)
+  while i < n:
+    character = regex[i]
+    if character == "\\":
+      if i + 1 == n:
+        raise Exception("The regex ends with a \\ that escapes nothing.")
+      token = ("char", regex[i + 1])
+      i += 2
+    elif character == "[":
+      j = i + 1
+      chars = []
+      while j < n and regex[j] != "]":
+        first, j = class_character(regex, j)
+        if j + 1 < n and regex[j] == "-" and regex[j + 1] != "]":
+          last, j = class_character(regex, j + 1)
+          if ord(last) < ord(first):
+            raise Exception(f"The range {first}-{last} in the character class at position {i} is empty.")
+          chars.extend(chr(code) for code in range(ord(first), ord(last) + 1))
+        else:
+          chars.append(first)
+      if j == n:
+        raise Exception(f"The character class at position {i} is not closed with ].")
+      if not chars:
+        raise Exception(f"The character class at position {i} is empty.")
+      token = ("class", tuple(dict.fromkeys(chars)))
+      i = j + 1
+    elif character in OPERATORS or character in "()":
+      token = ("op", character)
+      i += 1
     else:
-      postfix = postfix + character
-
+      token = ("char", character)
+      i += 1
+
+    if tokens and ends_operand(tokens[-1]) and starts_operand(token):
+      tokens.append(("op", "."))
+    tokens.append(token)
+  return tokens
+
+# The character at regex[j] inside [...] (a backslash escapes the next one) and the index after it
+def class_character(regex, j):
+  if regex[j] == "\\" and j + 1 < len(regex):
+    return regex[j + 1], j + 2
+  return regex[j], j + 1
+
+def ends_operand(token):
+  return token[0] != "op" or token[1] in "*+?)"
+
+def starts_operand(token):
+  return token[0] != "op" or token[1] == "("
+
+# ===================================== Parser =====================================
+# Operator precedence parsing (shunting yard) of the tokens into an abstract syntax tree, in one pass with list stacks:
+# ("char", c), ("class", chars), ("star", r), ("plus", r), ("opt", r), ("cat", r1, r2), ("alt", r1, r2)
+# The postfix operators * + ? bind tightest and are applied to the last operand right away, then comes "." and then "|".
+# Every token is pushed and popped at most once, so parsing is linear in the length of the regex.
+PRECEDENCE = {".": 2, "|": 1}
+UNARY = {"*": "star", "+": "plus", "?": "opt"}
+BINARY = {".": "cat", "|": "alt"}
+
+def parse_uncached(regex):
+  operands, operators = [], []
+
+  def reduce():
+    right, left = operands.pop(), operands.pop()
+    operands.append((BINARY[operators.pop()], left, right))
+
+  expect_operand = True
+  for position, (kind, value) in enumerate(tokenize(regex)):
+    if kind != "op":
+      operands.append((kind, value))
+      expect_operand = False
+    elif value == "(":
+      operators.append(value)
+      expect_operand = True
+    elif expect_operand:
+      raise Exception(f"The regex {regex!r} is missing an operand before token {position} ({value}).")
+    elif value in UNARY:
+      operands.append((UNARY[value], operands.pop()))
+    elif value == ")":
+      while operators and operators[-1] != "(":
+        reduce()
+      if not operators:
+        raise Exception(f"The regex {regex!r} has a ) that is not opened.")
+      operators.pop()
+    else:
+      while operators and operators[-1] != "(" and PRECEDENCE[operators[-1]] >= PRECEDENCE[value]:
+        reduce()
+      operators.append(value)
+      expect_operand = True
+
+  if expect_operand:
+    raise Exception(f"The regex {regex!r} is empty or ends with an operator.")
+  while operators:
+    if operators[-1] == "(":
+      raise Exception(f"The regex {regex!r} has a ( that is not closed.")
+    reduce()
+  return operands.pop()
+
+# The AST of a regex is kept in a cache (see pattern_cache below), so a regex is only parsed once
+def parse(regex):
+  return ast_cache.get(regex)
+
+# ===================================== Postfix =====================================
+# Writes the AST in postfix order for the Thompson construction. Characters are written as ("char", c) tokens, so an
+# escaped operator is not mistaken for an operator, and a class [abc] is written as the union a b | c |.
+# The tree is walked with an explicit stack, so very long or deeply nested regexes do not hit the recursion limit.
+POSTFIX = {"star": "*", "plus": "+", "opt": "?", "cat": ".", "alt": "|"}
+
+def to_postfix(ast):
+  postfix = []
+  stack = [(ast, False)]
   while stack:
-    postfix, stack = postfix + stack[-1], stack[:-1]
-
+    node, visited = stack.pop()
+    kind = node[0]
+    if kind == "char":
+      postfix.append(node)
+    elif kind == "class":
+      postfix.append(("char", node[1][0]))
+      for c in node[1][1:]:
+        postfix.append(("char", c))
+        postfix.append("|")
+    elif visited:
+      postfix.append(POSTFIX[kind])
+    else:
+      stack.append((node, True))
+      for child in reversed(node[1:]):
+        stack.append((child, False))
   return postfix
 
+# Infix regex to postfix: the list of tokens the Thompson construction reads
+def shunt(regex):
+  return to_postfix(parse(regex))
+
+# A postfix token is an operator or a character to read. Plain strings are read one character at a time, as before.
+def label_of(token):
+  return token[1] if isinstance(token, tuple) else token
+
 # ===================================== Thompsons construction Algorithm =====================================
 class state:
   label, edge1, edge2 = None, None, None
+  id = None
+
+# Above this many states the follow masks are not precomputed, the NFA is run on its flat program (see nfa.compile)
+BITSET_MAX_STATES = 1024
+
+# BIT_POSITIONS[v] lists the bits that are set in the byte v
+BIT_POSITIONS = [[bit for bit in range(8) if value >> bit & 1] for value in range(256)]
 
 class nfa:
   initial, accept = None, None
@@ -43,6 +167,123 @@ class nfa:
   def __init__(self, initial, accept):
     self.initial, self.accept = initial, accept
 
+  # Number the states 0..n-1 and precompute, once per regex, everything match needs:
+  # label_mask[c] - the states whose label is the character c, as a bitset (a python int)
+  # follow[i]     - the states reachable following e arrows from the state we move to after reading the label of state i
+  # Up to BITSET_MAX_STATES states follow[i] is a bitset and a step takes the union 8 states at a time (see
+  # step_chunks). Above that the follow sets are not built at all: in nested patterns like (0?)^n or 0*0*...0* every
+  # closure holds O(n) states, so storing them is O(|Q|^2) time and memory. The NFA is flattened into a program
+  # instead, and a step follows the e arrows from the states it reaches, marking each state once (see step).
+  def compile(self):
+    self.number()
+    self.num_bytes = (len(self.states) + 7) // 8
+    labelled = {}
+    for s in self.states:
+      if s.label is not None:
+        labelled.setdefault(s.label, []).append(s.id)
+    self.label_mask = {character: self.mask(ids) for character, ids in labelled.items()}
+
+    self.follow, self.chunks, self.program = None, None, None
+    if len(self.states) > BITSET_MAX_STATES:
+      self.program = self.flatten()
+      return self
+    self.follow = [None] * len(self.states)
+    for s in self.states:
+      if s.label is not None:
+        self.follow[s.id] = self.closure_mask(s.edge1)
+    self.chunks = {}
+    for character, mask in self.label_mask.items():
+      data = mask.to_bytes(self.num_bytes, "little")
+      self.chunks[character] = [(i, data[i], {}) for i in range(self.num_bytes) if data[i]]
+    self.step = self.step_chunks
+    return self
+
+  # Number the states reachable from the initial state 0..n-1 (depth first, edge1 before edge2) and list them in states
+  def number(self):
+    self.states = []
+    seen = set()
+    stack = [self.initial]
+    while stack:
+      s = stack.pop()
+      if s is None or s in seen:
+        continue
+      seen.add(s)
+      s.id = len(self.states)
+      self.states.append(s)
+      stack.append(s.edge2)
+      stack.append(s.edge1)
+    return self
+
+  # The flat program of the numbered NFA (see Flat Program below)
+  def flatten(self):
+    n = len(self.states)
+    op = array('b', [FAIL]) * n
+    label, out1, out2 = array('i', [-1]) * n, array('i', [-1]) * n, array('i', [-1]) * n
+    for s in self.states:
+      if s.label is not None:
+        op[s.id], label[s.id], out1[s.id] = CHAR, ord(s.label), s.edge1.id
+      elif s.edge1 is not None and s.edge2 is not None:
+        op[s.id], out1[s.id], out2[s.id] = SPLIT, s.edge1.id, s.edge2.id
+      elif s.edge1 is not None or s.edge2 is not None:
+        op[s.id], out1[s.id] = JMP, (s.edge1 or s.edge2).id
+      elif s is self.accept:
+        op[s.id] = MATCH
+    return program(op, label, out1, out2, self.initial.id)
+
+  # The bitset of a list of state ids, built in a bytearray so that setting a bit does not copy a long int
+  def mask(self, ids):
+    bits = bytearray(self.num_bytes)
+    for i in ids:
+      bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, "little")
+
+  # The states reachable from state following e arrows, as a bitset. On the program (large NFAs) only the states
+  # that read a character or have no way out are kept, the others are passed through on the way.
+  def closure_mask(self, state):
+    if self.program is None:
+      return self.mask([t.id for t in epsilon_reach(state)])
+    program = self.program
+    program.generation += 1
+    return self.mask(program.nlist[:program.add(program.nlist, 0, (state.id,))])
+
+  # Large NFAs: every state that can read the character moves on, and program.add follows the e arrows from where they
+  # land. A state is marked the first time it is reached in this step, so a step is linear in the size of the NFA.
+  def step(self, current_states, character):
+    candidates = current_states & self.label_mask.get(character, 0)
+    if not candidates:
+      return 0
+    program = self.program
+    out1 = program.out1
+    targets = []
+    for i, value in enumerate(candidates.to_bytes(self.num_bytes, "little")):
+      if value:
+        for bit in BIT_POSITIONS[value]:
+          targets.append(out1[i * 8 + bit])
+    program.generation += 1
+    return self.mask(program.nlist[:program.add(program.nlist, 0, targets)])
+
+  # The same union, a byte at a time: chunks[c] lists the bytes of the state bitset that hold states labelled c,
+  # with the bits of those states and the unions already worked out for the values of that byte seen so far.
+  # The active states in a byte are looked up by its value, so a step costs a few lookups per 8 states.
+  def step_chunks(self, current_states, character):
+    chunks = self.chunks.get(character)
+    if chunks is None:
+      return 0
+    data = current_states.to_bytes(self.num_bytes, "little")
+    next_states = 0
+    for i, bits, unions in chunks:
+      value = data[i] & bits
+      if value:
+        union = unions.get(value)
+        if union is None:
+          union = 0
+          for bit in range(8):
+            if value >> bit & 1:
+              union |= self.follow[i * 8 + bit]
+          unions[value] = union
+        next_states |= union
+    return next_states
+
 def re_to_nfa(postfix):
   nfa_stack = []
 
@@ -83,46 +324,462 @@ def re_to_nfa(postfix):
 
     else:
       accept, initial = state(), state()
-      initial.label, initial.edge1 = character, accept
+      initial.label, initial.edge1 = label_of(character), accept
       nfa_stack.append(nfa(initial, accept))
 
   return nfa_stack.pop()
 
+# ===================================== Flat Program =====================================
+# The NFA built by re_to_nfa, flattened: the states are their ids and the arrows are stored in parallel arrays (like
+# the instructions of Pike's VM) instead of linked state objects. nfa.compile flattens NFAs of more than
+# BITSET_MAX_STATES states, whose steps follow the e arrows on the program (program.add), and a compiled_regex with
+# lazy=False runs fullmatch and match on it directly.
+# op[i]    - CHAR (read label[i] and go to out1[i]), SPLIT (go to out1[i] and out2[i]), JMP (go to out1[i]),
+#            MATCH (the accept state) or FAIL (no way out)
+# label[i] - the code point read by a CHAR state, -1 otherwise
+# out1[i], out2[i] - the next states, -1 if there is none
+CHAR, SPLIT, JMP, MATCH, FAIL = 0, 1, 2, 3, 4
+
+class program:
+  def __init__(self, op, label, out1, out2, start):
+    self.op, self.label, self.out1, self.out2, self.start = op, label, out1, out2, start
+    n = len(op)
+    # two state lists (the current and the next one) and the stack used to follow e arrows, allocated once
+    self.clist, self.nlist, self.stack = array('i', [0]) * n, array('i', [0]) * n, array('i', [0]) * n
+    # mark[i] == generation means that state i is already in the list being built, so a new generation
+    # empties that list in O(1) without clearing anything
+    self.mark = array('L', [0]) * n
+    self.generation = 0
+
+  # Adds the states in targets and everything reachable from them by e arrows to the list, returns the new length of
+  # the list. All the targets of a step are added in one call, so a step is one walk over the states it reaches.
+  def add(self, states, length, targets):
+    op, out1, out2, mark, stack, generation = self.op, self.out1, self.out2, self.mark, self.stack, self.generation
+    top = 0
+    for i in targets:
+      if mark[i] != generation:
+        mark[i] = generation
+        stack[top] = i
+        top += 1
+    while top:
+      top -= 1
+      i = stack[top]
+      o = op[i]
+      if o == SPLIT:
+        for j in (out2[i], out1[i]):
+          if mark[j] != generation:
+            mark[j] = generation
+            stack[top] = j
+            top += 1
+      elif o == JMP:
+        j = out1[i]
+        if mark[j] != generation:
+          mark[j] = generation
+          stack[top] = j
+          top += 1
+      else:
+        states[length] = i
+        length += 1
+    return length
+
+  def accepting(self, states, length):
+    op = self.op
+    for k in range(length):
+      if op[states[k]] == MATCH:
+        return True
+    return False
+
+  # fullmatch/match as in compiled_regex, on the flat program
+  def run(self, string, anchored_end):
+    op, label, out1 = self.op, self.label, self.out1
+    clist, nlist = self.clist, self.nlist
+    self.generation += 1
+    length = self.add(clist, 0, (self.start,))
+    if not anchored_end and self.accepting(clist, length):
+      return True
+    for s in string:
+      c = ord(s)
+      self.generation += 1
+      targets = [out1[i] for i in clist[:length] if op[i] == CHAR and label[i] == c]
+      clist, nlist, length = nlist, clist, self.add(nlist, 0, targets)
+      if not length:
+        return False
+      if not anchored_end and self.accepting(clist, length):
+        return True
+    return anchored_end and self.accepting(clist, length)
+
+  def fullmatch(self, string):
+    return self.run(string, True)
+
+  def match(self, string):
+    return self.run(string, False)
+
+def re_to_program(postfix):
+  return re_to_nfa(postfix).number().flatten()
+
 # ===================================== Helper function =====================================
 # Returns set of states that can be reached from state following e arrows 
 # The main idea is to follow all the e arrows from the current state and add them to the set of states
+# We use an explicit stack instead of recursion, so deeply nested stars do not overflow the call stack
 def epsilon_reach(state):
   states = set()
-  states.add(state)
-
-  if state.label is None:
-    if state.edge1 is not None:
-      states |= epsilon_reach(state.edge1)
+  stack = [state]
 
-    if state.edge2 is not None:
-      states |= epsilon_reach(state.edge2)
+  while stack:
+    state = stack.pop()
+    if state is None or state in states:
+      continue
+    states.add(state)
+    if state.label is None:
+      stack.append(state.edge1)
+      stack.append(state.edge2)
 
   return states
 
-# ===================================== Match Function =====================================
-def match(regex, string):
-  postfix = shunt(regex)    # Convert infix to postfix
-  nfa = re_to_nfa(postfix)  # Convert postfix to NFA
-
-  current_states = set()    # Set of states that we are currently in
-  next_states = set()       # Set of states we can reach to
-
-  current_states |= epsilon_reach(nfa.initial)  # Add initial state to current states
+# ===================================== Lazy DFA =====================================
+# Subset construction done on the fly (like RE2's DFA): a set of NFA states (a bitset) becomes a DFA state the first time
+# we reach it, and the state it moves to on a character is remembered the first time that character is read.
+# On inputs that keep visiting the same sets of states (log lines, repeated words, ...) a step is just one dict lookup.
+# To bound memory, the whole cache is thrown away once it holds more than max_states DFA states.
+class dfa_state:
+  __slots__ = ('states', 'accepting', 'next')
+
+  def __init__(self, states, accepting):
+    self.states, self.accepting = states, accepting
+    self.next = {}    # character -> dfa_state
+
+class lazy_dfa:
+  def __init__(self, nfa, start, accept_mask, max_states=10000):
+    self.nfa = nfa
+    self.start = start
+    self.accept_mask = accept_mask
+    self.max_states = max_states
+    self.cache = {}   # bitset of NFA states -> dfa_state
+    self.flushes = 0
+
+  def state(self, states):
+    d = self.cache.get(states)
+    if d is None:
+      if len(self.cache) >= self.max_states:
+        self.cache = {}
+        self.flushes += 1
+      d = dfa_state(states, states & self.accept_mask != 0)
+      self.cache[states] = d
+    return d
+
+  def step(self, d, character):
+    n = d.next.get(character)
+    if n is None:
+      n = self.state(self.nfa.step(d.states, character))
+      d.next[character] = n
+    return n
+
+  def fullmatch(self, string):
+    d = self.state(self.start)
+    for s in string:
+      n = d.next.get(s)
+      if n is None:
+        n = self.step(d, s)
+      d = n
+    return d.accepting
+
+  def match(self, string):
+    d = self.state(self.start)
+    if d.accepting:
+      return True
+    for s in string:
+      n = d.next.get(s)
+      if n is None:
+        n = self.step(d, s)
+        if not n.states:
+          return False
+      d = n
+      if d.accepting:
+        return True
+    return False
+
+# ===================================== Compiled Regex =====================================
+# Building the NFA is the expensive part, so we do it once per regex and reuse it for every string
+#  - fullmatch(string): is the whole string in the language of the regex?
+#  - match(string): is some prefix of the string in the language of the regex? (like python's re.match)
+# With lazy=True (the default) both run on the lazy DFA, otherwise they step the NFA bitsets directly, or run the flat
+# program of the NFA if it has more than BITSET_MAX_STATES states (the state lists of the program are not turned into
+# bitsets at every step).
+class compiled_regex:
+  def __init__(self, regex, lazy=True, max_dfa_states=10000):
+    self.regex = regex
+    self.postfix = shunt(regex)           # Convert infix to postfix
+    self.nfa = re_to_nfa(self.postfix)    # Convert postfix to NFA
+    self.nfa.compile()                    # Precompute the e-closures of the states
+    self.start = self.nfa.closure_mask(self.nfa.initial)
+    self.accept_mask = 1 << self.nfa.accept.id
+    self.dfa = lazy_dfa(self.nfa, self.start, self.accept_mask, max_dfa_states) if lazy else None
+
+  def fullmatch(self, string):
+    if self.dfa is not None:
+      return self.dfa.fullmatch(string)
+    if self.nfa.program is not None:
+      return self.nfa.program.fullmatch(string)
+    current_states = self.start   # Bitset of states that we are currently in
+    for s in string:
+      current_states = self.nfa.step(current_states, s)   # Bitset of states we can reach using s
+      if not current_states:
+        return False
+    return current_states & self.accept_mask != 0
+
+  def match(self, string):
+    if self.dfa is not None:
+      return self.dfa.match(string)
+    if self.nfa.program is not None:
+      return self.nfa.program.match(string)
+    current_states = self.start
+    if current_states & self.accept_mask:
+      return True
+    for s in string:
+      current_states = self.nfa.step(current_states, s)
+      if current_states & self.accept_mask:
+        return True
+      if not current_states:
+        return False
+    return False
+
+  # Unanchored search: the leftmost match in string[pos:], as a (start, end) span, or None if there is none.
+  # Instead of trying every start position, a copy of the start states is added at every position (as if the start
+  # state had a self loop on every character) and all of them are stepped together in one pass.
+  # The states are kept in groups by the position where they started, earliest first, and a state reached from an
+  # earlier start is dropped from the later groups: whatever it matches next, the earlier start is further left.
+  # Once some group accepts no more starts are added and the later groups are dropped; the pass goes on while the
+  # remaining groups are alive, to find the longest match from the leftmost start (leftmost-longest, as in POSIX).
+  def search(self, string, pos=0):
+    step, start, accept_mask = self.nfa.step, self.start, self.accept_mask
+    groups = []   # (start position, bitset of states)
+    best = None
+    i = pos
+    while True:
+      if best is None:
+        taken = 0
+        for _, states in groups:
+          taken |= states
+        if start & ~taken:
+          groups.append((i, start & ~taken))
+
+      for k, (begin, states) in enumerate(groups):
+        if states & accept_mask:
+          best = (begin, i)
+          del groups[k + 1:]
+          break
+
+      if i == len(string) or not groups:
+        return best
+
+      character = string[i]
+      next_groups, taken = [], 0
+      for begin, states in groups:
+        states = step(states, character) & ~taken
+        if states:
+          taken |= states
+          next_groups.append((begin, states))
+      groups = next_groups
+      i += 1
+
+  # All the non-overlapping matches, left to right, as (start, end) spans.
+  # After an empty match the next search starts one character later, so the scan always moves forward.
+  def finditer(self, string):
+    pos = 0
+    while pos <= len(string):
+      span = self.search(string, pos)
+      if span is None:
+        return
+      yield span
+      pos = span[1] if span[1] > span[0] else span[1] + 1
+
+  # A stream_matcher reads the string in chunks, for inputs that do not fit in memory
+  def matcher(self, encoding="utf-8"):
+    return stream_matcher(self, encoding)
+
+# ===================================== Streaming Matcher =====================================
+# Checks a string that arrives in chunks (from a file, a socket, ...) in constant memory:
+#  - feed(chunk): read the next chunk, a str or bytes (bytes are decoded incrementally, so a character may be split between chunks)
+#  - is_accepting: is the input read so far in the language of the regex?
+#  - finish(): end of the input, returns is_accepting
+# Once no state is left the rest of the input is skipped, it can only be rejected.
+class stream_matcher:
+  def __init__(self, compiled, encoding="utf-8"):
+    self.compiled = compiled
+    self.encoding = encoding
+    self.reset()
+
+  def reset(self):
+    self.decoder = codecs.getincrementaldecoder(self.encoding)()
+    self.finished = False
+    if self.compiled.dfa is not None:
+      self.current = self.compiled.dfa.state(self.compiled.start)
+    else:
+      self.current = self.compiled.start
 
-  for s in string:  
-    for character in current_states:
-      if character.label == s:
-        next_states |= epsilon_reach(character.edge1)   # Add states that can be reached from current states using s
+  def states(self):
+    return self.current.states if self.compiled.dfa is not None else self.current
 
-    current_states = next_states    # Update current states
-    next_states = set()             # Reset next states
+  def feed(self, chunk):
+    if self.finished:
+      raise Exception("The input has already been finished. Call reset() to check another input.")
+    if not isinstance(chunk, str):
+      chunk = self.decoder.decode(chunk)
+    if not self.states():
+      return
+    dfa = self.compiled.dfa
+    current = self.current
+    if dfa is not None:
+      for s in chunk:
+        n = current.next.get(s)
+        if n is None:
+          n = dfa.step(current, s)
+          if not n.states:
+            current = n
+            break
+        current = n
+    else:
+      for s in chunk:
+        current = self.compiled.nfa.step(current, s)
+        if not current:
+          break
+    self.current = current
+
+  @property
+  def is_accepting(self):
+    return self.states() & self.compiled.accept_mask != 0
+
+  def finish(self):
+    if not self.finished:
+      self.feed(self.decoder.decode(b"", final=True))
+      self.finished = True
+    return self.is_accepting
+
+# Feeds a matcher from a file object (read) or a socket (recv) until the end of the stream
+def match_stream(regex, stream, chunk_size=1 << 16):
+  m = compile(regex).matcher()
+  read = stream.recv if hasattr(stream, "recv") else stream.read
+  while True:
+    chunk = read(chunk_size)
+    if not chunk:
+      break
+    m.feed(chunk)
+  return m.finish()
+
+# ===================================== Regex Set =====================================
+# Many regexes checked in one pass (like RE2::Set): the NFAs of all the patterns hang off one shared start state
+# (a chain of e states, since a state has at most two e arrows), and the accept state of pattern i is remembered in
+# accept_masks[i]. Running the combined NFA once over the string and looking at which accept states are active
+# at the end gives every pattern that matches the whole string.
+# With lazy=True (the default) the combined NFA runs on a lazy DFA, so sets of states seen before cost one lookup.
+class regex_set:
+  def __init__(self, regexes, lazy=True, max_dfa_states=10000):
+    self.regexes = list(regexes)
+    nfas = [re_to_nfa(shunt(regex)) for regex in self.regexes]
+
+    initial = state()
+    joint = initial
+    for i, n in enumerate(nfas):
+      joint.edge1 = n.initial
+      if i < len(nfas) - 1:
+        joint.edge2 = state()
+        joint = joint.edge2
+
+    self.nfa = nfa(initial, None)
+    self.nfa.compile()
+    self.start = self.nfa.closure_mask(initial)
+    self.accept_masks = [1 << n.accept.id for n in nfas]
+    self.accept_mask = 0
+    for mask in self.accept_masks:
+      self.accept_mask |= mask
+    self.dfa = lazy_dfa(self.nfa, self.start, self.accept_mask, max_dfa_states) if lazy else None
+
+  # The indices (in the order the regexes were given) of all the regexes that match the whole string
+  def matches(self, string):
+    if self.dfa is not None:
+      d = self.dfa.state(self.start)
+      for s in string:
+        n = d.next.get(s)
+        if n is None:
+          n = self.dfa.step(d, s)
+          if not n.states:
+            return []
+        d = n
+      current_states = d.states
+    else:
+      current_states = self.start
+      for s in string:
+        current_states = self.nfa.step(current_states, s)
+        if not current_states:
+          return []
+    if not current_states & self.accept_mask:
+      return []
+    return [i for i, mask in enumerate(self.accept_masks) if current_states & mask]
+
+# ===================================== Pattern Cache =====================================
+# Least recently used cache of compiled regexes keyed by the regex text, so match() does not rebuild the NFA on every call.
+# maxsize = 0 turns the cache off. hits/misses can be used to size the cache for a given mix of patterns.
+# build(regex) makes a missing entry (compiled_regex by default; the AST cache uses the parser).
+class pattern_cache:
+  def __init__(self, maxsize=128, build=None):
+    self.maxsize = maxsize
+    self.build = build
+    self.entries = OrderedDict()
+    self.hits, self.misses = 0, 0
+
+  def get(self, regex):
+    compiled = self.entries.get(regex)
+    if compiled is not None:
+      self.hits += 1
+      self.entries.move_to_end(regex)
+      return compiled
+
+    self.misses += 1
+    compiled = self.build(regex) if self.build is not None else compiled_regex(regex)
+    if self.maxsize > 0:
+      self.entries[regex] = compiled
+      self.evict()
+    return compiled
+
+  def evict(self):
+    while len(self.entries) > self.maxsize:
+      self.entries.popitem(last=False)
+
+  def resize(self, maxsize):
+    self.maxsize = maxsize
+    self.evict()
+
+  def clear(self):
+    self.entries.clear()
+    self.hits, self.misses = 0, 0
+
+  def info(self):
+    return {"hits": self.hits, "misses": self.misses, "maxsize": self.maxsize, "size": len(self.entries)}
+
+cache = pattern_cache()
+ast_cache = pattern_cache(1024, parse_uncached)
+
+def compile(regex):
+  return cache.get(regex)
+
+def set_cache_size(maxsize):
+  cache.resize(maxsize)
+
+def cache_info():
+  return cache.info()
+
+# ===================================== Search Functions =====================================
+# search(regex, string): span of the leftmost(-longest) match of regex in string, or None
+# finditer(regex, string): spans of all the non-overlapping matches of regex in string
+def search(regex, string):
+  return compile(regex).search(string)
+
+def finditer(regex, string):
+  return compile(regex).finditer(string)
 
-  m = nfa.accept in current_states
+# ===================================== Match Function =====================================
+def match(regex, string):
+  m = compile(regex).fullmatch(string)
   if m:
     msg = "Yayy! The string is in the language generated by the regex!🎉"
   else:
@@ -145,10 +802,16 @@ def match(regex, string):
 def check_valid_regex_format(regex):
   valid = True
   for character in regex:
-    if character not in ['0', '1', '(', ')', '*', '+', '?', '.', '|']:
+    if character not in ['0', '1', '(', ')', '*', '+', '?', '.', '|', '[', ']', '-', '\\']:
       valid = False
-      print("Invalid regex format. Please use the following characters: 0, 1, (, ), *, +, ?, ., |")
+      print("Invalid regex format. Please use the following characters: 0, 1, (, ), *, +, ?, ., |, [, ], -, \\")
       break
+  if valid:
+    try:
+      parse(regex)
+    except Exception as error:
+      valid = False
+      print("Invalid regex format.", error)
   return valid
 
 def main():
@@ -183,7 +846,5 @@ def main():
       return
   print("Goodbye!👋")
 
-main()
-  
-
-
+if __name__ == '__main__':
+  main()
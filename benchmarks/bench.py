@@ -0,0 +1,218 @@
+'''
+Benchmarks for the DFA, NFA and regex engines of a3 and a4.
+
+python benchmarks/bench.py [--full] [--repeat r] [--out results.json]
+    times every engine on synthetic automata and inputs and writes the results as JSON
+python benchmarks/bench.py --compare old.json new.json
+    prints how much slower or faster every benchmark got between two result files (e.g. two commits)
+
+The inputs are generated from a fixed seed, so two runs on different commits time the same work:
+• random complete DFAs with 10^2 to 10^5 states (10^6 with --full) over a 4 symbol alphabet
+• the pathological NFA for (a?)^n a^n, run on a^n (every backtracking matcher is exponential on it)
+• long random strings, and many short ones for the batch engines
+'''
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'a3'))
+
+from dfa import CompiledDFA, simulate_dfa
+from nfa import NFA, EPSILON
+from convert import determinize, minimize
+from stream import DFAMatcher, NFAMatcher
+
+# a4/main.py is loaded under its own name, so it does not clash with the other main modules
+spec = importlib.util.spec_from_file_location('regex', os.path.join(ROOT, 'a4', 'main.py'))
+regex = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(regex)
+
+try:
+    from vectorized import simulate_dfa_batch
+except ImportError:    # numpy is not installed
+    simulate_dfa_batch = None
+
+SEED = 1349
+
+# ==================================== Generators ====================================
+# missing is the fraction of transitions left out (a partial DFA)
+def random_dfa(num_states, alphabet, rng, missing=0.0):
+    states = [f'q{i}' for i in range(num_states)]
+    accept_states = [state for state in states if rng.random() < 0.5]
+    transitions = [(state, symbol, states[rng.randrange(num_states)]) for state in states for symbol in alphabet
+                   if not missing or rng.random() >= missing]
+    return CompiledDFA(states, list(alphabet), states[0], accept_states, transitions)
+
+def random_string(length, alphabet, rng):
+    return ''.join(rng.choice(alphabet) for _ in range(length))
+
+# NFA for (a?)^n a^n: a chain of n optional a's (an a arrow and an eps arrow skipping it) followed by n a's
+def pathological_nfa(n):
+    states = [f'p{i}' for i in range(2 * n + 1)]
+    transitions = []
+    for i in range(n):
+        transitions.append((states[i], 'a', states[i + 1]))
+        transitions.append((states[i], EPSILON, states[i + 1]))
+    for i in range(n, 2 * n):
+        transitions.append((states[i], 'a', states[i + 1]))
+    return NFA(states, ['a'], states[0], [states[-1]], transitions)
+
+def pathological_regex(n):
+    return '(a?)' * n + 'a' * n
+
+# ==================================== Timing ====================================
+# Runs run() repeat times and keeps the fastest time (the one least disturbed by the rest of the machine)
+def measure(run, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+class Suite:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def add(self, name, params, items, run):
+        seconds = measure(run, self.repeat)
+        result = {'name': name, 'params': params, 'seconds': seconds, 'items': items,
+                  'items_per_second': items / seconds if seconds > 0 else None}
+        self.results.append(result)
+        print(f'{name:32} {json.dumps(params):40} {seconds * 1000:12.3f} ms {result["items_per_second"] or 0:16.0f} /s')
+
+# ==================================== Benchmarks ====================================
+def bench_dfa(suite, full):
+    rng = random.Random(SEED)
+    alphabet = 'abcd'
+    sizes = [10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5] + ([10 ** 6] if full else [])
+    string = random_string(10 ** 6, alphabet, rng)
+    words = [random_string(rng.randint(4, 16), alphabet, rng) for _ in range(10 ** 5)]
+    partial_rng = random.Random(SEED + 1)    # a separate stream, so the other DFAs are the same as before
+
+    for size in sizes:
+        dfa = random_dfa(size, alphabet, rng)
+        params = {'states': size}
+        suite.add('simulate_dfa', dict(params, length=len(string)), len(string), lambda: simulate_dfa(dfa, string))
+        suite.add('DFAMatcher.feed', dict(params, length=len(string)), len(string), lambda: stream_dfa(dfa, string))
+        suite.add('simulate_dfa (many words)', dict(params, words=len(words)), len(words), lambda: [simulate_dfa(dfa, word) for word in words])
+        if simulate_dfa_batch is not None:
+            suite.add('simulate_dfa_batch', dict(params, words=len(words)), len(words), lambda: simulate_dfa_batch(dfa, words))
+        if size <= 10 ** 4:
+            suite.add('minimize', params, size, lambda: minimize(dfa))
+            partial = random_dfa(size, alphabet, partial_rng, missing=0.1)
+            suite.add('minimize (partial DFA)', params, size, lambda: minimize(partial))
+
+def stream_dfa(dfa, string, chunk_size=1 << 16):
+    matcher = DFAMatcher(dfa)
+    for i in range(0, len(string), chunk_size):
+        matcher.feed(string[i:i + chunk_size])
+    return matcher.finish()
+
+def bench_nfa(suite, full):
+    for n in [10, 30, 100] + ([300] if full else []):
+        nfa = pathological_nfa(n)
+        string = 'a' * n
+        params = {'n': n}
+        suite.add('NFA.simulate (a?)^n a^n', params, n, lambda: nfa.simulate(string, 'sets'))
+        suite.add('NFA.simulate bitset (a?)^n a^n', params, n, lambda: nfa.simulate(string, 'bitset'))
+        suite.add('NFAMatcher (a?)^n a^n', params, n, lambda: NFAMatcher(nfa).feed(string))
+        suite.add('determinize (a?)^n a^n', params, n, lambda: determinize(nfa))
+
+def bench_regex(suite, full):
+    rng = random.Random(SEED)
+    for n in [10, 30, 100] + ([300] if full else []):
+        pattern = pathological_regex(n)
+        string = 'a' * n
+        params = {'n': n}
+        suite.add('compiled_regex (a?)^n a^n', params, len(pattern), lambda: regex.compiled_regex(pattern))
+        compiled = regex.compiled_regex(pattern)
+        nfa_only = regex.compiled_regex(pattern, lazy=False)
+        program = regex.re_to_program(regex.shunt(pattern))
+        suite.add('fullmatch lazy (a?)^n a^n', params, n, lambda: compiled.fullmatch(string))
+        suite.add('fullmatch nfa (a?)^n a^n', params, n, lambda: nfa_only.fullmatch(string))
+        suite.add('program (a?)^n a^n', params, n, lambda: program.fullmatch(string))
+
+    pattern = '(0|1)*001(0|1)*'
+    compiled = regex.compiled_regex(pattern)
+    nfa_only = regex.compiled_regex(pattern, lazy=False)
+    program = regex.re_to_program(regex.shunt(pattern))
+    for length in [10 ** 4, 10 ** 5] + ([10 ** 6] if full else []):
+        string = random_string(length, '01', rng) + '1'
+        params = {'regex': pattern, 'length': length}
+        suite.add('match', params, length, lambda: regex.match(pattern, string))
+        suite.add('fullmatch lazy', params, length, lambda: compiled.fullmatch(string))
+        suite.add('fullmatch nfa', params, length, lambda: nfa_only.fullmatch(string))
+        suite.add('program.fullmatch', params, length, lambda: program.fullmatch(string))
+        suite.add('finditer', dict(params, regex='001'), length, lambda: list(regex.finditer('001', string)))
+
+    patterns = [random_string(rng.randint(3, 8), '01', rng) + '(0|1)*' for _ in range(100)]
+    regex_set = regex.regex_set(patterns)
+    words = [random_string(rng.randint(4, 16), '01', rng) for _ in range(10 ** 4)]
+    suite.add('regex_set.matches', {'patterns': len(patterns), 'words': len(words)}, len(words), lambda: [regex_set.matches(word) for word in words])
+
+    long_pattern = '(0|1)' * 10000
+    suite.add('parse', {'length': len(long_pattern)}, len(long_pattern), lambda: regex.parse_uncached(long_pattern))
+    suite.add('compiled_regex', {'length': len(long_pattern)}, len(long_pattern), lambda: regex.compiled_regex(long_pattern))
+    for pattern in ['0?' * 4000, '0*' * 4000]:
+        suite.add('compiled_regex', {'regex': pattern[:2] + ' x 4000'}, len(pattern), lambda: regex.compiled_regex(pattern))
+
+# ==================================== Results ====================================
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def key(result):
+    return result['name'] + ' ' + json.dumps(result['params'], sort_keys=True)
+
+def compare(old_file, new_file):
+    with open(old_file) as file:
+        old = {key(result): result for result in json.load(file)['results']}
+    with open(new_file) as file:
+        new = json.load(file)['results']
+    for result in new:
+        before = old.get(key(result))
+        if before is None:
+            print(f'{key(result):80} new')
+            continue
+        ratio = result['seconds'] / before['seconds'] if before['seconds'] > 0 else float('inf')
+        change = f'{1 / ratio:.2f}x faster' if ratio <= 1 else f'{ratio:.2f}x slower'
+        print(f'{key(result):80} {before["seconds"] * 1000:10.3f} ms -> {result["seconds"] * 1000:10.3f} ms  {change}')
+
+# ==================================== Main Function ====================================
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks for the DFA, NFA and regex engines.')
+    parser.add_argument('--full', action='store_true', help='also run the largest sizes (10^6 state DFAs, ...)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark, the fastest one is kept')
+    parser.add_argument('--out', default='benchmark.json', help='file to write the results to')
+    parser.add_argument('--only', choices=['dfa', 'nfa', 'regex'], help='run only one group of benchmarks')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two result files')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    suite = Suite(args.repeat)
+    for name, bench in (('dfa', bench_dfa), ('nfa', bench_nfa), ('regex', bench_regex)):
+        if args.only is None or args.only == name:
+            bench(suite, args.full)
+
+    with open(args.out, 'w') as file:
+        json.dump({'commit': git_commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+                   'seed': SEED, 'full': args.full, 'results': suite.results}, file, indent=2)
+    print(f'Wrote {len(suite.results)} results to {args.out}')
+
+# ==================================== Run ====================================
+if __name__ == '__main__':
+    main()